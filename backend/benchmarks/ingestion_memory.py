@@ -0,0 +1,139 @@
+"""Peak RSS of document ingestion against document size.
+
+Generates synthetic PDFs of increasing page counts and ingests each one in a
+fresh subprocess, once through the streaming pipeline and once by loading and
+splitting the whole document up front (the previous behaviour). Embeddings
+are faked and vectors discarded, so only parsing/splitting/batching memory is
+measured.
+
+    python -m benchmarks.ingestion_memory --pages 50 200 800
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Settings are required at import time but unused by the benchmark
+for key in ("SECRET_KEY", "OPENAI_API_KEY", "GOOGLE_API_KEY"):
+    os.environ.setdefault(key, "benchmark")
+
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do".split()
+
+
+def write_pdf(path: Path, pages: int, lines_per_page: int = 45) -> None:
+    """Write a minimal text-only PDF without third-party dependencies."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(pages):
+        lines = []
+        for line in range(lines_per_page):
+            words = [WORDS[(page + line + i) % len(WORDS)] for i in range(14)]
+            lines.append(f"({page} {line} {' '.join(words)}) Tj T*")
+        stream = ("BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(lines) + " ET").encode()
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    with path.open("wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, xref)
+        )
+
+
+def run_child(file_path: str, mode: str) -> dict:
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from src.core.embedding_batcher import EmbeddingBatcher
+    from src.services.vectorization_service import VectorizationService
+    from src.utils.doc_utils import load_document
+
+    embedding = DeterministicFakeEmbedding(size=1536)
+
+    class NullStore:
+        def add_documents(self, documents):
+            embedding.embed_documents([d.page_content for d in documents])
+
+    batcher = EmbeddingBatcher(
+        model="text-embedding-3-small",
+        max_tokens_per_batch=300_000,
+        max_items_per_batch=1_000,
+        concurrency=4,
+        max_retries=0,
+    )
+    service = VectorizationService(vector_store=NullStore(), embedding_batcher=batcher)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if mode == "streaming":
+        service.process_and_store_document(file_path, metadata={"document_id": 0})
+    else:
+        chunks = service.text_splitter.split_documents(load_document(file_path))
+        batcher.run(chunks, NullStore().add_documents)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"baseline_kb": baseline, "peak_kb": peak}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--child", nargs=2, metavar=("FILE", "MODE"))
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(*args.child)))
+        return
+
+    print(f"{'pages':>6} {'file MB':>8} {'mode':>10} {'peak RSS delta MB':>18}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            pdf = Path(tmp) / f"doc_{pages}.pdf"
+            write_pdf(pdf, pages)
+            size_mb = pdf.stat().st_size / 2**20
+            for mode in ("eager", "streaming"):
+                out = subprocess.run(
+                    [
+                        sys.executable,
+                        "-m",
+                        "benchmarks.ingestion_memory",
+                        "--child",
+                        str(pdf),
+                        mode,
+                    ],
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                result = json.loads(out.strip().splitlines()[-1])
+                delta = (result["peak_kb"] - result["baseline_kb"]) / 1024
+                print(f"{pages:>6} {size_mb:>8.1f} {mode:>10} {delta:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""Throughput and p50/p95/p99 latency of the API under a steady user load.
+
+Uploads documents, waits for their ingestion and opens conversations, then
+drives a mix of uploads, new conversations and messages (plain and streamed)
+at a target rate. Arrivals are open-loop (Poisson): a slow server builds a
+backlog instead of slowing the load down, so latencies include queueing.
+Streamed messages also report time to first token.
+
+Against a running server, with a user made by ``python cli.py create-user``:
+
+    python -m benchmarks.loadtest --base-url http://localhost:8000 \\
+        --email load@example.com --password secret --rps 20 --duration 60
+
+Or offline: ``--in-process`` serves the app from this process on a free port
+with SQLite, the scripted LLM and hashing embeddings in a temporary
+directory. Any of those settings already in the environment win, e.g.
+``DATABASE_BACKEND=postgresql`` to load a local Postgres instead.
+
+    python -m benchmarks.loadtest --in-process --rps 20 --duration 60
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+# Settings are required at import time but unused by the benchmark
+for key in ("SECRET_KEY", "OPENAI_API_KEY", "GOOGLE_API_KEY"):
+    os.environ.setdefault(key, "benchmark")
+
+SYLLABLES = "ba ce di fo gu la me ni po ru sa te vi xo zu an el in or us".split()
+
+
+class Recorder:
+    """Latencies (successes only) and error counts per endpoint."""
+
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.dropped = 0
+
+    def add(self, name: str, seconds: float, ok: bool = True) -> None:
+        if ok:
+            self.latencies[name].append(seconds * 1000)
+        else:
+            self.errors[name] += 1
+
+    def report(self, elapsed: float) -> None:
+        print(
+            f"{'endpoint':<36} {'count':>6} {'errors':>6} {'req/s':>7} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            latencies = self.latencies[name]
+            count = len(latencies) + self.errors[name]
+            p50, p95, p99 = (
+                np.percentile(latencies, [50, 95, 99]) if latencies else [np.nan] * 3
+            )
+            print(
+                f"{name:<36} {count:>6} {self.errors[name]:>6} "
+                f"{count / elapsed:>7.2f} {p50:>8.0f} {p95:>8.0f} {p99:>8.0f}"
+            )
+        if self.dropped:
+            print(f"{self.dropped} arrivals dropped at --max-in-flight")
+
+
+@dataclass
+class LoadState:
+    rng: random.Random
+    vocabulary: List[str]
+    questions: List[str]
+    documents: List[int] = field(default_factory=list)
+    conversations: List[int] = field(default_factory=list)
+    uploads: int = 0
+
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_text(words: int, state: LoadState) -> str:
+    sentences = []
+    while words > 0:
+        length = min(words, state.rng.randint(8, 20))
+        sentence = " ".join(state.rng.choices(state.vocabulary, k=length))
+        sentences.append(sentence.capitalize() + ".")
+        words -= length
+    # Unique per upload, identical content would be deduplicated
+    return f"Documento {state.uploads}. " + " ".join(sentences)
+
+
+def make_question(state: LoadState) -> str:
+    if state.questions:
+        return state.rng.choice(state.questions)
+    subject = " ".join(state.rng.choices(state.vocabulary, k=3))
+    return f"¿Qué dice el documento sobre {subject}?"
+
+
+async def timed_request(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    name: str,
+    method: str,
+    url: str,
+    **kwargs,
+) -> Optional[dict]:
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        recorder.add(name, 0, ok=False)
+        return None
+    ok = response.status_code < 400
+    recorder.add(name, time.perf_counter() - started, ok)
+    return response.json() if ok else None
+
+
+async def upload(
+    client: httpx.AsyncClient, recorder: Recorder, args, state: LoadState
+) -> None:
+    state.uploads += 1
+    files = {
+        "file": (
+            f"loadtest-{state.uploads}.txt",
+            make_text(args.document_words, state).encode(),
+            "text/plain",
+        )
+    }
+    started = time.perf_counter()
+    document = await timed_request(
+        client,
+        recorder,
+        "POST /documents/upload",
+        "POST",
+        "/api/documents/upload",
+        files=files,
+    )
+    if document is None:
+        return
+    # Polls are not recorded, only how long the document takes to be usable
+    while time.perf_counter() - started < args.ingestion_timeout:
+        try:
+            response = await client.get(f"/api/documents/{document['id']}")
+            status = response.json().get("status")
+        except (httpx.HTTPError, ValueError):
+            status = None
+        if status in ("completed", "failed"):
+            recorder.add(
+                "ingestion", time.perf_counter() - started, status == "completed"
+            )
+            if status == "completed":
+                state.documents.append(document["id"])
+            return
+        await asyncio.sleep(0.5)
+    recorder.add("ingestion", 0, ok=False)
+
+
+async def create_conversation(
+    client: httpx.AsyncClient, recorder: Recorder, args, state: LoadState
+) -> None:
+    conversation = await timed_request(
+        client,
+        recorder,
+        "POST /chat/conversations/",
+        "POST",
+        "/api/chat/conversations/",
+        json={
+            "title": f"Load test {len(state.conversations)}",
+            "document_id": state.rng.choice(state.documents),
+        },
+    )
+    if conversation is not None:
+        state.conversations.append(conversation["id"])
+
+
+def message_body(args, state: LoadState) -> dict:
+    provider, _, model = args.model.partition(":")
+    return {"content": make_question(state), "provider": provider, "model": model}
+
+
+async def send_message(
+    client: httpx.AsyncClient, recorder: Recorder, args, state: LoadState
+) -> None:
+    conversation_id = state.rng.choice(state.conversations)
+    await timed_request(
+        client,
+        recorder,
+        "POST /messages/",
+        "POST",
+        f"/api/chat/conversations/{conversation_id}/messages/",
+        json=message_body(args, state),
+    )
+
+
+async def stream_message(
+    client: httpx.AsyncClient, recorder: Recorder, args, state: LoadState
+) -> None:
+    conversation_id = state.rng.choice(state.conversations)
+    url = f"/api/chat/conversations/{conversation_id}/messages/stream"
+    started = time.perf_counter()
+    first_token = None
+    ok = False
+    try:
+        async with client.stream(
+            "POST", url, json=message_body(args, state)
+        ) as response:
+            if response.status_code < 400:
+                async for line in response.aiter_lines():
+                    if line == "event: token" and first_token is None:
+                        first_token = time.perf_counter() - started
+                    elif line in ("event: done", "event: error"):
+                        ok = line == "event: done"
+    except httpx.HTTPError:
+        pass
+    recorder.add("POST /messages/stream", time.perf_counter() - started, ok)
+    if ok and first_token is not None:
+        recorder.add("POST /messages/stream (first token)", first_token)
+
+
+async def run_load(client: httpx.AsyncClient, args, state: LoadState) -> None:
+    recorder = Recorder()
+    # Plain messages make up the rest of the mix
+    other = args.upload_ratio + args.conversation_ratio + args.stream_ratio
+    operations = [
+        (upload, args.upload_ratio),
+        (create_conversation, args.conversation_ratio),
+        (stream_message, args.stream_ratio),
+        (send_message, max(0.0, 1 - other)),
+    ]
+    functions, weights = zip(*operations)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    arrival = 0.0
+    tasks = set()
+    while True:
+        arrival += state.rng.expovariate(args.rps)
+        if arrival > args.duration:
+            break
+        await asyncio.sleep(max(0.0, started + arrival - loop.time()))
+        if len(tasks) >= args.max_in_flight:
+            recorder.dropped += 1
+            continue
+        operation = state.rng.choices(functions, weights)[0]
+        task = asyncio.create_task(operation(client, recorder, args, state))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    # Whatever is in flight is part of the run, let it finish
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - started
+
+    print(
+        f"\nLoad: {args.rps} req/s target for {args.duration}s, {elapsed:.1f}s wall\n"
+    )
+    recorder.report(elapsed)
+
+
+async def run(args: argparse.Namespace, base_url: str) -> None:
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(2_000, rng)
+    state = LoadState(rng=rng, vocabulary=vocabulary, questions=[])
+    state.questions = [make_question(state) for _ in range(args.question_pool)]
+
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        timeout=args.timeout,
+        limits=httpx.Limits(max_connections=args.max_in_flight + args.documents),
+    ) as client:
+        response = await client.post(
+            "/api/auth/login", json={"email": args.email, "password": args.password}
+        )
+        response.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        setup = Recorder()
+        started = time.perf_counter()
+        await asyncio.gather(
+            *[upload(client, setup, args, state) for _ in range(args.documents)]
+        )
+        if not state.documents:
+            raise SystemExit("No document finished ingesting, nothing to chat about")
+        await asyncio.gather(
+            *[
+                create_conversation(client, setup, args, state)
+                for _ in range(args.conversations)
+            ]
+        )
+        print(
+            f"Setup: {len(state.documents)} documents and "
+            f"{len(state.conversations)} conversations in "
+            f"{time.perf_counter() - started:.1f}s"
+        )
+        await run_load(client, args, state)
+
+
+def configure_offline(directory: str) -> None:
+    defaults = {
+        "DATABASE_BACKEND": "sqlite",
+        "SQLITE_PATH": os.path.join(directory, "loadtest.sqlite3"),
+        "LLM_BACKEND": "fake",
+        "EMBEDDING_BACKEND": "fake",
+        "LLM_WARMUP_MODELS": "[]",
+        "INGESTION_BROKER": "local",
+        "VECTOR_BACKEND": "numpy",
+        "NUMPY_STORE_DIRECTORY": os.path.join(directory, "vectors"),
+        "EMBEDDING_CACHE_PATH": os.path.join(directory, "embedding_cache.sqlite3"),
+        "UPLOAD_DIR": os.path.join(directory, "uploads"),
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+    # Only the default upload directory is created by the settings
+    os.makedirs(os.environ["UPLOAD_DIR"], exist_ok=True)
+
+
+def serve_in_process(email: str, password: str):
+    import uvicorn
+
+    from src.core.db import SessionLocal, create_tables
+    from src.core.security import get_password_hash
+    from src.main import create_application
+    from src.models.user_model import User
+
+    # Building the app imports every model, create_tables needs them
+    app = create_application()
+    create_tables()
+    with SessionLocal() as db:
+        if not db.query(User).filter(User.email == email).first():
+            db.add(User(email=email, hashed_password=get_password_hash(password)))
+            db.commit()
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise SystemExit("The in-process server failed to start")
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--base-url", help="Server to load, e.g. http://localhost:8000")
+    target.add_argument(
+        "--in-process", action="store_true", help="Serve the app offline from here"
+    )
+    parser.add_argument("--email", default="loadtest@example.com")
+    parser.add_argument("--password", default="loadtest")
+    parser.add_argument("--rps", type=float, default=10.0, help="Target arrivals/s")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds")
+    parser.add_argument("--max-in-flight", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--documents", type=int, default=3, help="Uploaded in setup")
+    parser.add_argument("--conversations", type=int, default=20, help="Opened in setup")
+    parser.add_argument("--document-words", type=int, default=5_000)
+    parser.add_argument("--ingestion-timeout", type=float, default=300.0)
+    parser.add_argument("--stream-ratio", type=float, default=0.5)
+    parser.add_argument("--upload-ratio", type=float, default=0.02)
+    parser.add_argument("--conversation-ratio", type=float, default=0.05)
+    parser.add_argument(
+        "--question-pool",
+        type=int,
+        default=0,
+        help="Draw questions from this many (exercises caches), 0 for all unique",
+    )
+    parser.add_argument("--model", default="openai:gpt-4o-mini")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if not args.in_process:
+        asyncio.run(run(args, args.base_url))
+        return
+
+    directory = tempfile.mkdtemp(prefix="loadtest-")
+    configure_offline(directory)
+    try:
+        server, thread, base_url = serve_in_process(args.email, args.password)
+        try:
+            asyncio.run(run(args, base_url))
+        finally:
+            server.should_exit = True
+            thread.join()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
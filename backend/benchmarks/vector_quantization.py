@@ -0,0 +1,117 @@
+"""Memory, latency and recall@10 of quantized NumpyVectorStore shards.
+
+Builds one shard of synthetic clustered unit vectors (the shape of
+text-embedding-3-small output) for every quantization mode and runs the same
+queries against each. Recall is measured against exact float32 search, the
+current setup. Memory is the size of the arrays a hot shard keeps resident:
+the whole float32 matrix without quantization, only the codes otherwise.
+
+    python -m benchmarks.vector_quantization --chunks 20000 --queries 200
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+# Settings are required at import time but unused by the benchmark
+for key in ("SECRET_KEY", "OPENAI_API_KEY", "GOOGLE_API_KEY"):
+    os.environ.setdefault(key, "benchmark")
+
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+from src.core.numpy_store import QUANTIZATION_MODES, NumpyVectorStore  # noqa: E402
+
+SHARD = {"content_hash": "benchmark"}
+
+
+class LookupEmbeddings(Embeddings):
+    """Returns precomputed vectors, texts are row numbers."""
+
+    def __init__(self, vectors: np.ndarray) -> None:
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.vectors[[int(text) for text in texts]]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.vectors[int(text)]
+
+
+def make_vectors(count: int, dims: int, clusters: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dims), dtype=np.float32)
+    vectors = centers[rng.integers(clusters, size=count)]
+    vectors += 0.6 * rng.standard_normal((count, dims), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_store(directory: str, vectors: np.ndarray, mode: str, rescore: int):
+    store = NumpyVectorStore(
+        LookupEmbeddings(vectors),
+        directory=directory,
+        quantization=mode,
+        rescore_factor=rescore,
+    )
+    texts = [str(row) for row in range(len(vectors))]
+    for start in range(0, len(texts), 5_000):
+        batch = texts[start : start + 5_000]
+        store.add_texts(batch, metadatas=[SHARD] * len(batch), ids=batch)
+    store.compact()
+    return store
+
+
+def resident_bytes(store: NumpyVectorStore) -> int:
+    shard = store._load_shard(store._shard_keys()[0])
+    if store.quantization == "none":
+        return sum(part.vectors.nbytes for part in shard.parts)
+    return sum(array.nbytes for part in shard.parts for array in part.codes.values())
+
+
+def run(args: argparse.Namespace) -> None:
+    vectors = make_vectors(args.chunks, args.dims, args.clusters, seed=0)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(len(vectors), size=args.queries)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape, dtype=np.float32)
+
+    exact = None
+    print(
+        f"{'mode':>8} {'memory MiB':>11} {'p50 ms':>8} {'p95 ms':>8} {'recall@10':>10}"
+    )
+    for mode in QUANTIZATION_MODES:
+        with tempfile.TemporaryDirectory() as directory:
+            store = build_store(directory, vectors, mode, args.rescore)
+            latencies, results = [], []
+            for query in queries:
+                start = time.perf_counter()
+                found = store.similarity_search_by_vector_with_score(
+                    query, k=10, filter=SHARD
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+                results.append({doc.id for doc, _ in found})
+            memory = resident_bytes(store) / 2**20
+
+        if exact is None:
+            exact = results
+        recall = np.mean([len(a & b) / 10 for a, b in zip(results, exact)])
+        print(
+            f"{mode:>8} {memory:>11.1f} {np.percentile(latencies, 50):>8.2f} "
+            f"{np.percentile(latencies, 95):>8.2f} {recall:>10.3f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--rescore", type=int, default=8, help="Rescore factor")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
+from chromadb.errors import NotFoundError
 from typer import Typer, Option, secho, colors
-from sqlalchemy.orm import Session
-
-from src.core.db import create_tables
+from src.core.chroma_partitions import PartitionedChroma
+from src.core.config import settings
+from src.core.db import SessionLocal, create_tables
+from src.core.queue import celery_app
 from src.core.security import get_password_hash
+from src.core.store import compact_vector_store, embedding_batcher, vector_store
+from src.core.vector_keys import shard_key
+from src.models.document_model import Document
 from src.models.user_model import User
-from src.dependencies import get_db
+from src.services.vectorization_service import VectorizationService
 
 
 app = Typer()
@@ -20,13 +25,97 @@ def create_user(
     email: str = Option(..., prompt=True, help="Email del usuario"),
     password: str = Option(..., prompt=True, hide_input=True, confirmation_prompt=True),
 ):
-    db: Session = next(get_db())
     hashed = get_password_hash(password)
     user = User(email=email, hashed_password=hashed)
-    db.add(user)
-    db.commit()
+    with SessionLocal() as db:
+        db.add(user)
+        db.commit()
     secho(f"✅ User '{email}' created!", fg=colors.GREEN)
 
 
+@app.command()
+def worker(
+    concurrency: int = Option(
+        settings.INGESTION_CONCURRENCY, help="Number of worker processes"
+    ),
+):
+    celery_app.worker_main(
+        ["worker", f"--concurrency={concurrency}", "--loglevel=info"]
+    )
+
+
+@app.command()
+def purge_vectors(
+    dry_run: bool = Option(False, help="Only report orphaned vectors"),
+    compact: bool = Option(True, help="Compact the vector store afterwards"),
+):
+    with SessionLocal() as db:
+        rows = db.query(Document.id, Document.content_hash).all()
+    live_ids = {id for id, _ in rows}
+    live_hashes = {content_hash for _, content_hash in rows if content_hash}
+
+    def is_live(metadata: dict) -> bool:
+        if "content_hash" in metadata:
+            return metadata["content_hash"] in live_hashes
+        return metadata.get("document_id") in live_ids
+
+    service = VectorizationService(
+        vector_store=vector_store, embedding_batcher=embedding_batcher
+    )
+    orphans = service.find_orphan_chunks(is_live)
+    secho(f"Found {len(orphans)} orphaned vectors", fg=colors.YELLOW)
+    if dry_run:
+        return
+
+    if orphans:
+        service.delete_chunks(orphans)
+        secho(f"✅ Deleted {len(orphans)} orphaned vectors", fg=colors.GREEN)
+    if compact and compact_vector_store():
+        secho("✅ Vector store compacted", fg=colors.GREEN)
+
+
+@app.command()
+def split_collection(
+    source: str = Option("documents", help="Monolithic collection to split"),
+    batch_size: int = Option(1_000, help="Vectors copied per batch"),
+    drop_source: bool = Option(False, help="Delete the source when done"),
+):
+    if not isinstance(vector_store, PartitionedChroma):
+        secho("Set CHROMA_PARTITIONING=document first", fg=colors.RED)
+        raise SystemExit(1)
+    try:
+        collection = vector_store.client.get_collection(source)
+    except NotFoundError:
+        secho(f"Collection '{source}' not found", fg=colors.RED)
+        raise SystemExit(1)
+
+    copied = 0
+    while True:
+        # Stored embeddings are copied as they are: nothing is re-embedded
+        page = collection.get(
+            limit=batch_size,
+            offset=copied,
+            include=["embeddings", "documents", "metadatas"],
+        )
+        if not page["ids"]:
+            break
+        grouped: dict[str, list[int]] = {}
+        for row, metadata in enumerate(page["metadatas"]):
+            grouped.setdefault(shard_key(metadata), []).append(row)
+        for key, rows in grouped.items():
+            vector_store.partition(key)._collection.upsert(
+                ids=[page["ids"][row] for row in rows],
+                embeddings=[page["embeddings"][row] for row in rows],
+                documents=[page["documents"][row] for row in rows],
+                metadatas=[page["metadatas"][row] for row in rows],
+            )
+        copied += len(page["ids"])
+        secho(f"Copied {copied} vectors", fg=colors.YELLOW)
+
+    if drop_source:
+        vector_store.client.delete_collection(source)
+    secho(f"✅ Split {copied} vectors into partitions", fg=colors.GREEN)
+
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import count
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from src.core.config import settings
+
+
+@dataclass
+class _Answer:
+    document_id: int
+    model: str
+    history: str
+    vector: np.ndarray
+    chunk_ids: tuple
+    answer: str
+    expires_at: float
+
+
+class AnswerCache:
+    """Semantic cache of generated answers per (document, model, history).
+
+    A cached answer is reused when a new question's embedding is within
+    ``threshold`` cosine similarity of a cached question and retrieval returned
+    the same chunks, so answers built from stale vectors are never served.
+    ``history`` is a digest of the conversation so far: a follow-up question
+    only means the same thing after the same conversation.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, threshold: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, _Answer] = OrderedDict()
+        self._buckets: dict[tuple[int, str, str], set[int]] = {}
+        self._ids = count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1)
+
+    def get(
+        self,
+        document_id: int,
+        model: str,
+        history: str,
+        vector: Sequence[float],
+        chunk_ids: List[str],
+    ) -> Optional[str]:
+        query = self._normalize(vector)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            bucket = self._buckets.get((document_id, model, history), ())
+            for entry_id in list(bucket):
+                entry = self._entries[entry_id]
+                if entry.expires_at <= now:
+                    self._remove(entry_id)
+                    continue
+                score = float(entry.vector @ query)
+                if score >= best_score and entry.chunk_ids == tuple(chunk_ids):
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id].answer
+
+    def put(
+        self,
+        document_id: int,
+        model: str,
+        history: str,
+        vector: Sequence[float],
+        chunk_ids: List[str],
+        answer: str,
+    ) -> None:
+        entry = _Answer(
+            document_id=document_id,
+            model=model,
+            history=history,
+            vector=self._normalize(vector),
+            chunk_ids=tuple(chunk_ids),
+            answer=answer,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            key = (document_id, model, history)
+            self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, document_id: int) -> None:
+        """Forget every answer for a document, e.g. when it is re-ingested."""
+        with self._lock:
+            for bucket in [key for key in self._buckets if key[0] == document_id]:
+                for entry_id in list(self._buckets[bucket]):
+                    self._remove(entry_id)
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        key = (entry.document_id, entry.model, entry.history)
+        bucket = self._buckets[key]
+        bucket.discard(entry_id)
+        if not bucket:
+            del self._buckets[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+answer_cache = None
+if settings.ANSWER_CACHE_ENABLED:
+    answer_cache = AnswerCache(
+        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+        threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    )
@@ -0,0 +1,21 @@
+from pathlib import Path
+
+from src.core.config import settings
+
+
+class BlobStore:
+    """Content-addressed file store: each blob lives at ``<root>/<sha[:2]>/<sha><ext>``."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def path_for(self, sha256: str, suffix: str) -> Path:
+        directory = self.root / sha256[:2]
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory / f"{sha256}{suffix.lower()}"
+
+    def delete(self, path: str | Path) -> None:
+        Path(path).unlink(missing_ok=True)
+
+
+blob_store = BlobStore(settings.UPLOAD_DIR)
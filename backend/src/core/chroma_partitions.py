@@ -0,0 +1,232 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable, List, Optional, Tuple
+
+import chromadb
+from chromadb.errors import NotFoundError
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from src.core.vector_keys import shard_key, shard_key_from_chunk_id
+
+
+class PartitionedChroma(VectorStore):
+    """Chroma store that keeps every document in its own collection.
+
+    Chunks are routed by their shard key (content hash or document id) to a
+    ``<prefix>_<key>`` collection, so a document search only walks that
+    document's HNSW graph and deleting a document drops a whole collection.
+    Collection handles are kept in a small LRU to avoid a lookup per request.
+    """
+
+    def __init__(
+        self,
+        client: chromadb.ClientAPI,
+        embedding: Embeddings,
+        prefix: str = "documents",
+        max_open_collections: int = 256,
+    ) -> None:
+        self.client = client
+        self._embedding = embedding
+        self.prefix = prefix
+        self.max_open_collections = max_open_collections
+        self._handles: OrderedDict[str, Chroma] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        client: chromadb.ClientAPI,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> "PartitionedChroma":
+        store = cls(client=client, embedding=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    def collection_name(self, key: str) -> str:
+        return f"{self.prefix}_{key}"
+
+    def partition(self, key: str, create: bool = True) -> Optional[Chroma]:
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is None:
+                try:
+                    handle = Chroma(
+                        client=self.client,
+                        collection_name=self.collection_name(key),
+                        embedding_function=self._embedding,
+                        create_collection_if_not_exists=create,
+                    )
+                except NotFoundError:
+                    return None
+                self._handles[key] = handle
+            self._handles.move_to_end(key)
+            while len(self._handles) > self.max_open_collections:
+                self._handles.popitem(last=False)
+            return handle
+
+    def _forget(self, partition: Chroma) -> None:
+        with self._lock:
+            for key, handle in list(self._handles.items()):
+                if handle is partition:
+                    del self._handles[key]
+
+    def _collection_names(self) -> List[str]:
+        return [
+            name
+            for name in (
+                getattr(collection, "name", collection)
+                for collection in self.client.list_collections()
+            )
+            if name.startswith(f"{self.prefix}_")
+        ]
+
+    def _partition_keys(self) -> List[str]:
+        return sorted(name[len(self.prefix) + 1 :] for name in self._collection_names())
+
+    def _partitions_for_filter(self, filter: Optional[dict]) -> List[Chroma]:
+        keys = [shard_key(filter)] if filter else self._partition_keys()
+        return [
+            partition
+            for partition in (self.partition(key, create=False) for key in keys)
+            if partition is not None
+        ]
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        grouped: dict[str, List[int]] = {}
+        for row, metadata in enumerate(metadatas):
+            grouped.setdefault(shard_key(metadata), []).append(row)
+
+        added = []
+        for key, rows in grouped.items():
+            added.extend(
+                self.partition(key).add_texts(
+                    [texts[row] for row in rows],
+                    metadatas=[metadatas[row] for row in rows],
+                    ids=[ids[row] for row in rows] if ids else None,
+                )
+            )
+        return added
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> None:
+        if where:
+            key = shard_key(where)
+            with self._lock:
+                self._handles.pop(key, None)
+            try:
+                self.client.delete_collection(self.collection_name(key))
+            except NotFoundError:
+                pass
+        if ids:
+            by_key: dict[Optional[str], List[str]] = {}
+            for id in ids:
+                by_key.setdefault(shard_key_from_chunk_id(id), []).append(id)
+            for key, key_ids in by_key.items():
+                keys = [key] if key is not None else self._partition_keys()
+                for partition_key in keys:
+                    partition = self.partition(partition_key, create=False)
+                    if partition is not None:
+                        partition.delete(key_ids)
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None,
+    ) -> dict[str, Any]:
+        """Chroma-compatible listing across all partitions."""
+        include = include or ["metadatas", "documents"]
+        result: dict[str, list] = {"ids": [], **{field: [] for field in include}}
+        skip = offset or 0
+        for partition in self._partitions_for_filter(where):
+            remaining = None if limit is None else limit - len(result["ids"])
+            if remaining == 0:
+                break
+            count = partition._collection.count()
+            if skip >= count:
+                skip -= count
+                continue
+            page = partition.get(ids=ids, limit=remaining, offset=skip, include=include)
+            skip = 0
+            result["ids"].extend(page["ids"])
+            for field in include:
+                result[field].extend(page[field])
+        return result
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(
+            self._embedding.embed_query(query), k=k, filter=filter
+        )
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None
+    ) -> List[Tuple[Document, float]]:
+        results = []
+        for partition in self._partitions_for_filter(filter):
+            # The partition only holds this document, no metadata filter needed
+            try:
+                results.extend(
+                    partition.similarity_search_by_vector_with_relevance_scores(
+                        embedding, k=k
+                    )
+                )
+            except NotFoundError:
+                # Dropped by another process since the handle was cached
+                self._forget(partition)
+        # Chroma returns distances: lower is closer
+        return sorted(results, key=lambda result: result[1])[:k]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return [
+            doc
+            for doc, _ in self.similarity_search_by_vector_with_score(
+                embedding, k=k, filter=filter
+            )
+        ]
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            doc
+            for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)
+        ]
+
+    def _select_relevance_score_fn(self):
+        # Partitions use Chroma's default l2 space
+        return self._euclidean_relevance_score_fn
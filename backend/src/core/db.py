@@ -1,7 +1,137 @@
-from sqlalchemy import create_engine
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
 from src.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL, echo=False)
+
+class PoolMetrics:
+    """Counters for connection checkouts and the time spent waiting for them."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def record_connect(self) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidation(self) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            avg_wait = self.total_wait_seconds / self.checkouts if self.checkouts else 0
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "avg_wait_ms": avg_wait * 1000,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+            }
+
+
+class _CheckoutTimingMixin:
+    """Measures how long each pool checkout blocks the caller."""
+
+    metrics: PoolMetrics
+
+    def connect(self):
+        start = time.perf_counter()
+        connection = super().connect()
+        self.metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _instrument(pool, metrics: PoolMetrics) -> None:
+    pool.metrics = metrics
+    event.listen(pool, "connect", lambda *args: metrics.record_connect())
+    event.listen(pool, "invalidate", lambda *args: metrics.record_invalidation())
+
+
+pool_options = {
+    "pool_size": settings.DATABASE_POOL_SIZE,
+    "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+    "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+    "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+    "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+}
+if settings.DATABASE_BACKEND == "sqlite":
+    # Pooled connections move between threads, writers wait for the lock
+    pool_options["connect_args"] = {"check_same_thread": False, "timeout": 30}
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    # WAL lets readers run while ingestion writes
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+engine = create_engine(
+    settings.DATABASE_URL,
+    echo=False,
+    poolclass=InstrumentedQueuePool,
+    **pool_options,
+)
+pool_metrics = PoolMetrics()
+_instrument(engine.pool, pool_metrics)
+if settings.DATABASE_BACKEND == "sqlite":
+    event.listen(engine, "connect", _sqlite_pragmas)
+
+SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    echo=False,
+    poolclass=InstrumentedAsyncQueuePool,
+    **pool_options,
+)
+async_pool_metrics = PoolMetrics()
+_instrument(async_engine.sync_engine.pool, async_pool_metrics)
+if settings.DATABASE_BACKEND == "sqlite":
+    event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+
+def get_pool_stats() -> dict:
+    return {
+        "sync": pool_metrics.snapshot(engine.pool),
+        "async": async_pool_metrics.snapshot(async_engine.sync_engine.pool),
+    }
 
 
 def create_tables():
@@ -0,0 +1,162 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List
+
+import openai
+from langchain_core.documents import Document
+
+from src.utils.token_utils import get_token_counter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchStats:
+    chunks: int = 0
+    batches: int = 0
+    tokens: int = 0
+    rate_limited: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    return (
+        isinstance(exc, openai.RateLimitError)
+        or getattr(exc, "status_code", None) == 429
+        # google.api_core errors carry the HTTP status as ``code``
+        or getattr(exc, "code", None) == 429
+    )
+
+
+class EmbeddingBatcher:
+    """Packs chunks into token-bounded batches and stores them concurrently.
+
+    Concurrency is adaptive: a rate-limited batch halves the number of batches
+    allowed in flight and is retried with exponential backoff, and every
+    successful batch lets the limit grow back towards ``concurrency``.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        max_tokens_per_batch: int,
+        max_items_per_batch: int,
+        concurrency: int,
+        max_retries: int,
+        backoff_seconds: float = 1.0,
+    ) -> None:
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.max_items_per_batch = max_items_per_batch
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.model = model
+
+        self._limit = concurrency
+        self._active = 0
+        self._slots = threading.Condition()
+
+    def count_tokens(self, text: str) -> int:
+        return get_token_counter(self.model).count(text)
+
+    def pack(self, chunks: Iterable[Document]) -> Iterator[tuple[List[Document], int]]:
+        batch: List[Document] = []
+        batch_tokens = 0
+        for chunk in chunks:
+            tokens = self.count_tokens(chunk.page_content)
+            if batch and (
+                batch_tokens + tokens > self.max_tokens_per_batch
+                or len(batch) >= self.max_items_per_batch
+            ):
+                yield batch, batch_tokens
+                batch, batch_tokens = [], 0
+            batch.append(chunk)
+            batch_tokens += tokens
+        if batch:
+            yield batch, batch_tokens
+
+    def _acquire(self) -> None:
+        with self._slots:
+            while self._active >= self._limit:
+                self._slots.wait()
+            self._active += 1
+
+    def _release(self, succeeded: bool) -> None:
+        with self._slots:
+            self._active -= 1
+            if succeeded:
+                self._limit = min(self.concurrency, self._limit + 1)
+            else:
+                self._limit = max(1, self._limit // 2)
+            self._slots.notify_all()
+
+    def _store_batch(
+        self,
+        batch: List[Document],
+        store: Callable[[List[Document]], object],
+        stats: BatchStats,
+    ) -> None:
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            try:
+                store(batch)
+            except Exception as exc:
+                self._release(succeeded=False)
+                if not is_rate_limited(exc) or attempt == self.max_retries:
+                    raise
+                # Workers share the stats, count under the lock
+                with self._slots:
+                    stats.rate_limited += 1
+                delay = self.backoff_seconds * 2**attempt
+                time.sleep(delay + random.uniform(0, delay))
+            else:
+                self._release(succeeded=True)
+                return
+
+    def run(
+        self,
+        chunks: Iterable[Document],
+        store: Callable[[List[Document]], object],
+    ) -> BatchStats:
+        stats = BatchStats()
+        start = time.perf_counter()
+        pending: set[Future] = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                for batch, tokens in self.pack(chunks):
+                    # Keep a bounded number of batches queued ahead of the workers
+                    while len(pending) >= self.concurrency * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    pending.add(executor.submit(self._store_batch, batch, store, stats))
+                    with self._slots:
+                        stats.chunks += len(batch)
+                        stats.batches += 1
+                        stats.tokens += tokens
+                for future in pending:
+                    future.result()
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+
+        stats.elapsed = time.perf_counter() - start
+        logger.info(
+            "Embedded %d chunks (%d tokens) in %d batches: %.1f chunks/s, "
+            "%d rate-limited retries",
+            stats.chunks,
+            stats.tokens,
+            stats.batches,
+            stats.chunks_per_second,
+            stats.rate_limited,
+        )
+        return stats
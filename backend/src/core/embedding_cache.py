@@ -0,0 +1,302 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables.config import run_in_executor
+
+# Fraction of max_entries written between two eviction passes
+EVICT_EVERY = 1 / 16
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding store keyed by (model, text hash) with LRU eviction."""
+
+    def __init__(self, path: Path, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._written = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_embeddings_last_used "
+            "ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return [
+            np.frombuffer(found[key], dtype=np.float32).tolist()
+            if key in found
+            else None
+            for key in keys
+        ]
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]) -> None:
+        now = time.time()
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in zip(keys, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+            # COUNT(*) scans the table, so only check the size every few writes.
+            # Other workers share the file, so a running count would drift.
+            self._written += len(rows)
+            if self._written >= max(1, int(self.max_entries * EVICT_EVERY)):
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        self._written = 0
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self.evictions += excess
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": count,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class QueryEmbeddingCache:
+    """In-memory TTL + LRU cache of query embeddings.
+
+    Lookups that miss here fall back to ``shared`` (the SQLite cache, visible
+    to every worker on the host) before going upstream.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        shared: Optional[EmbeddingCache] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, List[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split()).casefold()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        vector = self.get_local(key)
+        if vector is None:
+            vector = self.get_shared([key])[0]
+        return vector
+
+    def get_local(self, key: str) -> Optional[List[float]]:
+        """In-memory lookup, a miss is only counted by ``get_shared``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+        return None
+
+    def get_shared(self, keys: List[str]) -> List[Optional[List[float]]]:
+        """Look up keys that missed in memory. Blocks on SQLite when shared."""
+        vectors = self.shared.get_many(keys) if self.shared else [None] * len(keys)
+        with self._lock:
+            found = sum(1 for vector in vectors if vector is not None)
+            self.shared_hits += found
+            self.misses += len(keys) - found
+        for key, vector in zip(keys, vectors):
+            if vector is not None:
+                self.put_local(key, vector)
+        return vectors
+
+    def put(self, key: str, vector: List[float]) -> None:
+        self.put_local(key, vector)
+        self.put_shared([key], [vector])
+
+    def put_shared(self, keys: List[str], vectors: List[List[float]]) -> None:
+        if self.shared:
+            self.shared.put_many(keys, vectors)
+
+    def put_local(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.hits + self.shared_hits) / lookups if lookups else 0.0
+                ),
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends texts missing from the cache upstream."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        cache: Optional[EmbeddingCache] = None,
+        query_cache: Optional[QueryEmbeddingCache] = None,
+    ):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+        self.query_cache = query_cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.cache is None:
+            return self.embeddings.embed_documents(texts)
+        keys = [EmbeddingCache.make_key(self.model, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        if missing:
+            missing_keys = list(missing)
+            embedded = self.embeddings.embed_documents(list(missing.values()))
+            self.cache.put_many(missing_keys, embedded)
+            by_key = dict(zip(missing_keys, embedded))
+            vectors = [
+                vector if vector is not None else by_key[key]
+                for key, vector in zip(keys, vectors)
+            ]
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.query_cache is None:
+            return self.embeddings.embed_query(text)
+        normalized = QueryEmbeddingCache.normalize(text)
+        key = EmbeddingCache.make_key(self.model, normalized)
+        vector = self.query_cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(normalized)
+            self.query_cache.put(key, vector)
+        return vector
+
+    async def _aget(self, keys: List[str]) -> List[Optional[List[float]]]:
+        # The in-memory cache is cheap enough inline, SQLite is not
+        vectors = [self.query_cache.get_local(key) for key in keys]
+        missing = [key for key, vector in zip(keys, vectors) if vector is None]
+        if missing:
+            found = await run_in_executor(None, self.query_cache.get_shared, missing)
+            by_key = dict(zip(missing, found))
+            vectors = [
+                vector if vector is not None else by_key[key]
+                for key, vector in zip(keys, vectors)
+            ]
+        return vectors
+
+    async def _aput(self, keys: List[str], vectors: List[List[float]]) -> None:
+        for key, vector in zip(keys, vectors):
+            self.query_cache.put_local(key, vector)
+        if self.query_cache.shared:
+            await run_in_executor(None, self.query_cache.put_shared, keys, vectors)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if self.query_cache is None:
+            return await self.embeddings.aembed_query(text)
+        normalized = QueryEmbeddingCache.normalize(text)
+        key = EmbeddingCache.make_key(self.model, normalized)
+        [vector] = await self._aget([key])
+        if vector is None:
+            vector = await self.embeddings.aembed_query(normalized)
+            await self._aput([key], [vector])
+        return vector
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries with at most one upstream request."""
+        if self.query_cache is None:
+            return await self.embeddings.aembed_documents(texts)
+        normalized = [QueryEmbeddingCache.normalize(text) for text in texts]
+        keys = [EmbeddingCache.make_key(self.model, text) for text in normalized]
+        vectors = await self._aget(keys)
+
+        missing = {}
+        for key, text, vector in zip(keys, normalized, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        if missing:
+            # Same model and input as embed_query, so the vectors match
+            embedded = await self.embeddings.aembed_documents(list(missing.values()))
+            by_key = dict(zip(missing, embedded))
+            await self._aput(list(by_key), list(by_key.values()))
+            vectors = [
+                vector if vector is not None else by_key[key]
+                for key, vector in zip(keys, vectors)
+            ]
+        return vectors
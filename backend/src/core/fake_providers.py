@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class LatencyModel:
+    """Lognormal latencies around ``median_ms``, reproducible from ``seed``."""
+
+    def __init__(self, median_ms: float, sigma: float, seed: int) -> None:
+        self.median = median_ms / 1000
+        self.sigma = sigma
+        self._random = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        return self.median * self._random.lognormvariate(0.0, self.sigma)
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+
+
+class HashingEmbeddings(Embeddings):
+    """Feature-hashed bag of words, no network and no model.
+
+    Each word lands in one signed dimension, so texts sharing words get close
+    vectors and retrieval behaves plausibly. Vectors are L2-normalized like
+    OpenAI's, and every request waits for a sampled provider latency.
+    """
+
+    def __init__(self, size: int = 1536, latency: Optional[LatencyModel] = None):
+        self.size = size
+        self.latency = latency
+
+    def embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in WORD.findall(text.lower()):
+            digest = _digest(word)
+            vector[digest % self.size] += 1.0 if digest >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            # Empty text still needs a valid unit vector
+            vector[0], norm = 1.0, 1.0
+        return (vector / norm).tolist()
+
+    def _delay(self) -> float:
+        return self.latency.sample() if self.latency else 0.0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self._delay())
+        return [self.embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self._delay())
+        return [self.embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model that answers from the prompt itself, at a set pace.
+
+    The answer depends only on the messages: words picked from the prompt by
+    a hash of it, so repeated questions get the same reply. The first token
+    arrives after a lognormal delay around ``first_token_ms`` and the rest at
+    ``tokens_per_second``. ``failure_rate`` of the calls raise instead.
+    """
+
+    model_name: str = "scripted"
+    first_token_ms: float = 400.0
+    latency_sigma: float = 0.5
+    tokens_per_second: float = 60.0
+    answer_tokens: int = 120
+    failure_rate: float = 0.0
+    seed: int = 0
+
+    _latency: LatencyModel = PrivateAttr()
+    _random: random.Random = PrivateAttr()
+
+    def model_post_init(self, context: Any) -> None:
+        seed = self.seed ^ _digest(self.model_name)
+        self._latency = LatencyModel(self.first_token_ms, self.latency_sigma, seed)
+        self._random = random.Random(seed + 1)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name}
+
+    def script(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = "\n".join(str(message.content) for message in messages)
+        words = WORD.findall(prompt) or ["ok"]
+        picker = random.Random(_digest(prompt))
+        return [
+            ("" if i == 0 else " ") + picker.choice(words)
+            for i in range(self.answer_tokens)
+        ]
+
+    def _plan(self) -> float:
+        """First token delay for this call, or raise if it is meant to fail."""
+        if self._random.random() < self.failure_rate:
+            raise RuntimeError(f"Scripted failure of {self.model_name}")
+        return self._latency.sample()
+
+    @property
+    def _token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self.script(messages)
+        time.sleep(self._plan() + (len(tokens) - 1) * self._token_delay)
+        message = AIMessage(content="".join(tokens))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tokens = self.script(messages)
+        await asyncio.sleep(self._plan() + (len(tokens) - 1) * self._token_delay)
+        message = AIMessage(content="".join(tokens))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        tokens = self.script(messages)
+        time.sleep(self._plan())
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self._token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        tokens = self.script(messages)
+        await asyncio.sleep(self._plan())
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self._token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
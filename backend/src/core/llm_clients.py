@@ -0,0 +1,192 @@
+import importlib.util
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Tuple, Union
+
+import anyio
+import httpx
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_openai import ChatOpenAI
+
+from src.core.config import settings
+from src.core.fake_providers import ScriptedChatModel
+from src.schemas.chat_schemas import LLMModel, LLMProvider
+
+logger = logging.getLogger(__name__)
+
+ChatModel = Union[ChatOpenAI, ChatGoogleGenerativeAI, ScriptedChatModel]
+
+
+def parse_model_name(name: str) -> Tuple[LLMProvider, LLMModel]:
+    """Split a ``"provider:model"`` setting."""
+    provider, _, model = name.partition(":")
+    return LLMProvider(provider), LLMModel(model)
+
+
+class LLMClientRegistry:
+    """Long-lived chat model clients keyed by (provider, model, temperature).
+
+    OpenAI models share one sync and one async ``httpx`` client with
+    keep-alive (and HTTP/2 when ``h2`` is installed), so connections and TLS
+    sessions survive across messages. Gemini talks gRPC through its own SDK:
+    caching the model instance is what keeps its channel open.
+    """
+
+    def __init__(
+        self,
+        max_connections: int,
+        max_keepalive_connections: int,
+        keepalive_expiry: float,
+        timeout: float,
+        http2: bool,
+    ) -> None:
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("h2 is not installed, LLM clients fall back to HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = timeout
+        self._models: Dict[Tuple[LLMProvider, LLMModel, float], ChatModel] = {}
+        self._http_clients: Dict[
+            LLMProvider, Tuple[httpx.Client, httpx.AsyncClient]
+        ] = {}
+        self._counters: Dict[LLMProvider, Dict[str, int]] = defaultdict(
+            lambda: defaultdict(int)
+        )
+        self._lock = threading.Lock()
+
+    def _count(self, provider: LLMProvider, name: str) -> None:
+        self._counters[provider][name] += 1
+
+    def _http_clients_for(
+        self, provider: LLMProvider
+    ) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        if provider not in self._http_clients:
+
+            async def on_request(request: httpx.Request) -> None:
+                self._count(provider, "requests")
+
+            async def on_response(response: httpx.Response) -> None:
+                if response.status_code >= 400:
+                    self._count(provider, "errors")
+
+            options = {"limits": self._limits, "timeout": self.timeout}
+            self._http_clients[provider] = (
+                httpx.Client(http2=self.http2, **options),
+                httpx.AsyncClient(
+                    http2=self.http2,
+                    event_hooks={"request": [on_request], "response": [on_response]},
+                    **options,
+                ),
+            )
+        return self._http_clients[provider]
+
+    def get(
+        self, provider: LLMProvider, model: LLMModel, temperature: float = 0.3
+    ) -> ChatModel:
+        key = (provider, model, temperature)
+        with self._lock:
+            llm = self._models.get(key)
+            if llm is not None:
+                self._count(provider, "reused")
+                return llm
+            self._count(provider, "created")
+            llm = self._models[key] = self._create(provider, model, temperature)
+            return llm
+
+    def _create(
+        self, provider: LLMProvider, model: LLMModel, temperature: float
+    ) -> ChatModel:
+        if settings.LLM_BACKEND == "fake":
+            return ScriptedChatModel(
+                model_name=f"{provider}:{model}",
+                first_token_ms=settings.FAKE_LLM_FIRST_TOKEN_MS,
+                latency_sigma=settings.FAKE_LATENCY_SIGMA,
+                tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
+                answer_tokens=settings.FAKE_LLM_ANSWER_TOKENS,
+                failure_rate=settings.FAKE_LLM_FAILURE_RATE,
+                seed=settings.FAKE_SEED,
+            )
+        if provider == LLMProvider.OPENAI:
+            http_client, http_async_client = self._http_clients_for(provider)
+            return ChatOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                model=model.value,
+                temperature=temperature,
+                timeout=self.timeout,
+                http_client=http_client,
+                http_async_client=http_async_client,
+            )
+        elif provider == LLMProvider.GEMINI:
+            return ChatGoogleGenerativeAI(
+                google_api_key=settings.GOOGLE_API_KEY,
+                model=model.value,
+                temperature=temperature,
+                timeout=self.timeout,
+            )
+        else:
+            raise ValueError(
+                f"Not supported provider: '{provider}' with model '{model}'"
+            )
+
+    async def warmup(self, models: list[str], timeout: float = 5.0) -> None:
+        """Open connections ahead of the first message.
+
+        ``models`` are ``"provider:model"`` strings. Failures are only logged,
+        a provider being unreachable must not keep the API from starting.
+        """
+        for name in models:
+            try:
+                llm = self.get(*parse_model_name(name))
+                with anyio.fail_after(timeout):
+                    if isinstance(llm, ChatOpenAI):
+                        # Cheap authenticated call that leaves a pooled connection
+                        await llm.root_async_client.models.list()
+                logger.info("Warmed up LLM client %s", name)
+            except Exception as exc:
+                logger.warning("Could not warm up LLM client %s: %s", name, exc)
+
+    async def aclose(self) -> None:
+        for http_client, http_async_client in self._http_clients.values():
+            http_client.close()
+            await http_async_client.aclose()
+        self._http_clients.clear()
+        self._models.clear()
+
+    def stats(self) -> dict:
+        stats = {}
+        for provider in LLMProvider:
+            counters = self._counters.get(provider, {})
+            provider_stats = {
+                "clients": sum(1 for key in self._models if key[0] == provider),
+                "created": counters.get("created", 0),
+                "reused": counters.get("reused", 0),
+            }
+            if provider in self._http_clients:
+                pool = getattr(
+                    self._http_clients[provider][1]._transport, "_pool", None
+                )
+                connections = getattr(pool, "connections", [])
+                provider_stats.update(
+                    http2=self.http2,
+                    requests=counters.get("requests", 0),
+                    errors=counters.get("errors", 0),
+                    connections=len(connections),
+                    idle_connections=sum(1 for c in connections if c.is_idle()),
+                )
+            stats[provider.value] = provider_stats
+        return stats
+
+
+llm_registry = LLMClientRegistry(
+    max_connections=settings.LLM_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS,
+    timeout=settings.LLM_TIMEOUT_SECONDS,
+    http2=settings.LLM_HTTP2,
+)
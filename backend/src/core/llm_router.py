@@ -0,0 +1,358 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+
+from src.core.config import settings
+from src.core.embedding_batcher import is_rate_limited
+from src.core.llm_clients import llm_registry, parse_model_name
+from src.core.rate_limiter import (
+    INTERACTIVE,
+    RateLimitScheduler,
+    estimate_chat_tokens,
+    rate_limiter,
+    retry_after,
+)
+from src.schemas.chat_schemas import LLMModel, LLMProvider
+
+logger = logging.getLogger(__name__)
+
+ModelFactory = Callable[[LLMProvider, LLMModel], BaseChatModel]
+
+# A 429 queues the call again behind the provider's penalty this many times
+RATE_LIMIT_RETRIES = 2
+
+
+class ProviderUnavailableError(RuntimeError):
+    """Every candidate model is behind an open circuit breaker."""
+
+
+class LatencyWindow:
+    """Latencies and outcomes of the last ``size`` calls to one model."""
+
+    def __init__(self, size: int, min_samples: int = 20) -> None:
+        self.latencies: Deque[float] = deque(maxlen=size)
+        self.failures: Deque[bool] = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def add(self, latency: Optional[float], failed: bool) -> None:
+        if latency is not None:
+            self.latencies.append(latency)
+        self.failures.append(failed)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.latencies) < self.min_samples:
+            return None
+        return float(np.percentile(self.latencies, q))
+
+    def stats(self) -> dict:
+        return {
+            "calls": len(self.failures),
+            "p50_ms": _ms(self.percentile(50)),
+            "p95_ms": _ms(self.percentile(95)),
+            "error_rate": (
+                round(sum(self.failures) / len(self.failures), 4)
+                if self.failures
+                else 0.0
+            ),
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    Once ``cooldown`` has passed a single trial call goes through: success
+    closes the breaker, failure keeps it open for another cooldown.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "half_open":
+            # Let this call through as the trial, hold the others back
+            self.opened_at = time.monotonic()
+            self.trial = True
+        return state != "open"
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial = False
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """The trial ended without a verdict (cancelled), let the next call try."""
+        if self.trial:
+            self.trial = False
+            self.opened_at = time.monotonic() - self.cooldown
+
+
+class GenerationRouter:
+    """Sends generations to the requested model, hedged by a fallback.
+
+    If the primary has not answered (or, streaming, produced a first token)
+    within its rolling p95 latency, the same prompt goes to the configured
+    fallback model as well. The first to complete wins and the other is
+    cancelled. A primary that fails fails over right away, and one whose
+    breaker is open is skipped.
+    """
+
+    def __init__(
+        self,
+        model_factory: ModelFactory,
+        rate_limiter: RateLimitScheduler,
+        fallbacks: Dict[str, str],
+        hedge_min_delay: float,
+        hedge_max_delay: float,
+        window: int,
+        breaker_failures: int,
+        breaker_cooldown: float,
+    ) -> None:
+        self.model_factory = model_factory
+        self.rate_limiter = rate_limiter
+        self.fallbacks = fallbacks
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self._windows: Dict[Tuple[str, str], LatencyWindow] = defaultdict(
+            lambda: LatencyWindow(window)
+        )
+        self._breakers: Dict[str, CircuitBreaker] = defaultdict(
+            lambda: CircuitBreaker(breaker_failures, breaker_cooldown)
+        )
+        self._counters: Dict[str, int] = defaultdict(int)
+
+    def hedge_delay(self, name: str, kind: str) -> float:
+        p95 = self._windows[(name, kind)].percentile(95)
+        if p95 is None:
+            return self.hedge_max_delay
+        return min(max(p95, self.hedge_min_delay), self.hedge_max_delay)
+
+    def _record(self, name: str, kind: str, started: float, outcome: str) -> None:
+        breaker = self._breakers[name]
+        if outcome == "rate_limited":
+            # Quota, not health: neither a latency sample nor a verdict
+            breaker.release_trial()
+            return
+        failed = outcome == "failed"
+        latency = None if failed else time.perf_counter() - started
+        self._windows[(name, kind)].add(latency, failed)
+        if failed:
+            breaker.record_failure()
+            if breaker.state == "open":
+                logger.warning("Circuit breaker for %s is open", name)
+        elif outcome == "ok":
+            breaker.record_success()
+        else:
+            breaker.release_trial()
+
+    def _throttled(self, name: str, exc: BaseException) -> bool:
+        """Quota, not health: hold every caller back, keep the breaker out."""
+        if not is_rate_limited(exc):
+            return False
+        provider, _ = parse_model_name(name)
+        self.rate_limiter.penalize(provider.value, retry_after(exc))
+        self._counters["rate_limited"] += 1
+        return True
+
+    async def _acquire(self, name: str, messages: List[BaseMessage]) -> BaseChatModel:
+        provider, model = parse_model_name(name)
+        await self.rate_limiter.aacquire(
+            provider.value, estimate_chat_tokens(messages, model.value), INTERACTIVE
+        )
+        return self.model_factory(provider, model)
+
+    async def ainvoke(
+        self, provider: LLMProvider, model: LLMModel, messages: List[BaseMessage]
+    ) -> str:
+        async def invoke(name: str) -> str:
+            for attempt in range(RATE_LIMIT_RETRIES + 1):
+                llm = await self._acquire(name, messages)
+                started = time.perf_counter()
+                try:
+                    response = await llm.ainvoke(messages)
+                except asyncio.CancelledError:
+                    # A lost hedge still took at least this long
+                    self._record(name, "invoke", started, "cancelled")
+                    raise
+                except Exception as exc:
+                    if self._throttled(name, exc):
+                        if attempt < RATE_LIMIT_RETRIES:
+                            continue
+                        self._record(name, "invoke", started, "rate_limited")
+                        raise
+                    self._record(name, "invoke", started, "failed")
+                    raise
+                self._record(name, "invoke", started, "ok")
+                return response.content
+
+        _, content = await self._race(f"{provider}:{model}", "invoke", invoke)
+        return content
+
+    async def astream(
+        self, provider: LLMProvider, model: LLMModel, messages: List[BaseMessage]
+    ) -> AsyncIterator[str]:
+        """Stream from whichever model produces a first token first."""
+        streams: Dict[str, AsyncIterator[str]] = {}
+
+        async def first_token(name: str) -> Optional[str]:
+            stream = streams[name] = self._stream(name, messages)
+            try:
+                return await stream.__anext__()
+            except StopAsyncIteration:
+                return None
+
+        try:
+            winner, token = await self._race(
+                f"{provider}:{model}", "stream", first_token
+            )
+            for name, stream in streams.items():
+                if name != winner:
+                    await stream.aclose()
+            if token is None:
+                return
+            yield token
+            async for token in streams[winner]:
+                yield token
+        finally:
+            for stream in streams.values():
+                await stream.aclose()
+
+    async def _stream(self, name: str, messages: List[BaseMessage]):
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            llm = await self._acquire(name, messages)
+            started = time.perf_counter()
+            first = True
+            try:
+                async for chunk in llm.astream(messages):
+                    if not chunk.content:
+                        continue
+                    if first:
+                        # Time to first token is what the user waits on
+                        self._record(name, "stream", started, "ok")
+                        first = False
+                    yield chunk.content
+            except asyncio.CancelledError:
+                if first:
+                    self._record(name, "stream", started, "cancelled")
+                raise
+            except Exception as exc:
+                if self._throttled(name, exc):
+                    # Only retried before any token went out
+                    if first and attempt < RATE_LIMIT_RETRIES:
+                        continue
+                    self._record(name, "stream", started, "rate_limited")
+                    raise
+                self._record(name, "stream", started, "failed")
+                raise
+            if first:
+                self._record(name, "stream", started, "ok")
+            return
+
+    async def _race(
+        self, primary: str, kind: str, start: Callable[[str], Awaitable[Any]]
+    ) -> Tuple[str, Any]:
+        fallback = self.fallbacks.get(primary)
+        if not self._breakers[primary].allow():
+            if fallback is None or not self._breakers[fallback].allow():
+                raise ProviderUnavailableError(f"{primary} is unavailable")
+            self._counters["breaker_skips"] += 1
+            primary, fallback = fallback, None
+
+        tasks = {asyncio.create_task(start(primary)): primary}
+        delay = self.hedge_delay(primary, kind) if fallback else None
+        error: Optional[BaseException] = None
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(
+                    tasks, timeout=delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    name = tasks.pop(task)
+                    if task.exception() is None:
+                        if name != primary:
+                            self._counters["fallback_wins"] += 1
+                        return name, task.result()
+                    error = task.exception()
+                    logger.warning("Generation with %s failed: %s", name, error)
+                if fallback and (not done or not tasks):
+                    if self._breakers[fallback].allow():
+                        self._counters["hedges" if not done else "failovers"] += 1
+                        tasks[asyncio.create_task(start(fallback))] = fallback
+                    fallback = delay = None
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            **{
+                name: self._counters[name]
+                for name in (
+                    "hedges",
+                    "failovers",
+                    "fallback_wins",
+                    "breaker_skips",
+                    "rate_limited",
+                )
+            },
+            "models": {
+                f"{name} ({kind})": {
+                    **window.stats(),
+                    "breaker": self._breakers[name].state,
+                }
+                for (name, kind), window in self._windows.items()
+            },
+        }
+
+
+generation_router = GenerationRouter(
+    model_factory=lambda provider, model: llm_registry.get(provider, model),
+    rate_limiter=rate_limiter,
+    fallbacks=settings.LLM_FALLBACKS,
+    hedge_min_delay=settings.LLM_HEDGE_MIN_DELAY_SECONDS,
+    hedge_max_delay=settings.LLM_HEDGE_MAX_DELAY_SECONDS,
+    window=settings.LLM_LATENCY_WINDOW,
+    breaker_failures=settings.LLM_BREAKER_FAILURES,
+    breaker_cooldown=settings.LLM_BREAKER_COOLDOWN_SECONDS,
+)
@@ -0,0 +1,420 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from src.core.vector_keys import shard_key, shard_key_from_chunk_id
+
+QUANTIZATION_MODES = ("none", "int8", "binary")
+
+
+def quantize(vectors: np.ndarray, mode: str) -> Dict[str, np.ndarray]:
+    """Compress normalized float32 vectors into first-pass search codes.
+
+    ``int8`` stores each dimension scaled by its largest magnitude in the
+    part, ``binary`` only keeps the sign of every component (1 bit).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if mode == "int8":
+        scale = np.abs(vectors).max(axis=0) / 127
+        scale[scale == 0] = 1
+        codes = np.rint(vectors / scale).astype(np.int8)
+        return {"codes": codes, "scale": scale.astype(np.float32)}
+    if mode == "binary":
+        return {"codes": np.packbits(vectors > 0, axis=1)}
+    raise ValueError(f"Not supported quantization: '{mode}'")
+
+
+def approximate_scores(
+    codes: Dict[str, np.ndarray], query: np.ndarray, mode: str, block: int = 1024
+) -> np.ndarray:
+    """Score every code against ``query``, higher is closer.
+
+    Codes are decoded in blocks so temporary arrays stay small.
+    """
+    if mode == "int8":
+        weighted = query * codes["scale"]
+
+        def score(rows):
+            return rows.astype(np.float32) @ weighted
+
+    else:
+        bits = np.packbits(query > 0)
+
+        def score(rows):
+            # Negated Hamming distance between sign codes
+            return -np.bitwise_count(rows ^ bits).sum(axis=1, dtype=np.int32)
+
+    scores = np.empty(len(codes["codes"]), dtype=np.float32)
+    for start in range(0, len(scores), block):
+        scores[start : start + block] = score(codes["codes"][start : start + block])
+    return scores
+
+
+@dataclass
+class _Part:
+    path: Path
+    vectors: np.ndarray
+    ids: List[str]
+    texts: List[str]
+    metadatas: List[dict]
+    codes: Optional[Dict[str, np.ndarray]] = None
+
+
+@dataclass
+class _Shard:
+    mtime_ns: int
+    parts: List[_Part] = field(default_factory=list)
+
+
+class NumpyVectorStore(VectorStore):
+    """Exact in-process vector index with one memory-mapped shard per document.
+
+    Every shard is a directory of parts, each part a normalized float32
+    ``.npy`` matrix plus a ``.json`` sidecar with ids, texts and metadata.
+    Searching a document is a single matmul and argpartition per part. Shards
+    are opened lazily and the most recently used ones are kept in an LRU.
+
+    With ``quantization`` set to ``int8`` or ``binary`` only the compressed
+    codes (``.<mode>.npz``) are held in memory. They rank every chunk and the
+    best ``k * rescore_factor`` are rescored against the memory-mapped float32
+    vectors, so only those rows are read from disk.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        directory: Path,
+        max_hot_shards: int = 256,
+        quantization: str = "none",
+        rescore_factor: int = 8,
+    ) -> None:
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Not supported quantization: '{quantization}'")
+        self._embedding = embedding
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_hot_shards = max_hot_shards
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self._hot: OrderedDict[str, _Shard] = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        directory: Path,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(embedding=embedding, directory=directory, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    # Shard IO
+
+    def _shard_dir(self, key: str) -> Path:
+        return self.directory / key
+
+    def _write_part(self, key: str, vectors, ids, texts, metadatas) -> None:
+        shard_dir = self._shard_dir(key)
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        name = f"part-{uuid.uuid4().hex}"
+        tmp_vectors = shard_dir / f".{name}.npy"
+        tmp_meta = shard_dir / f".{name}.json"
+        np.save(tmp_vectors, np.ascontiguousarray(vectors, dtype=np.float32))
+        with tmp_meta.open("w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "texts": texts, "metadatas": metadatas}, f)
+        if self.quantization != "none":
+            tmp_codes = shard_dir / f".{name}.{self.quantization}.npz"
+            np.savez(tmp_codes, **quantize(vectors, self.quantization))
+            os.replace(tmp_codes, shard_dir / f"{name}.{self.quantization}.npz")
+        # The sidecar is renamed last: a part only exists once it is complete
+        os.replace(tmp_vectors, shard_dir / f"{name}.npy")
+        os.replace(tmp_meta, shard_dir / f"{name}.json")
+
+    def _remove_part(self, part: _Part) -> None:
+        part.path.with_suffix(".json").unlink(missing_ok=True)
+        for codes in part.path.parent.glob(f"{part.path.name}.*.npz"):
+            codes.unlink(missing_ok=True)
+        part.path.with_suffix(".npy").unlink(missing_ok=True)
+
+    def _load_codes(self, path: Path, vectors: np.ndarray):
+        if self.quantization == "none":
+            return None
+        codes_path = path.parent / f"{path.name}.{self.quantization}.npz"
+        if codes_path.exists():
+            with np.load(codes_path) as codes:
+                return dict(codes)
+        # Parts written before quantization was enabled
+        return quantize(vectors, self.quantization)
+
+    def _load_shard(self, key: str) -> Optional[_Shard]:
+        shard_dir = self._shard_dir(key)
+        try:
+            mtime_ns = shard_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._hot.pop(key, None)
+            return None
+
+        shard = self._hot.get(key)
+        # Other processes (ingestion workers) may have added or removed parts
+        if shard is None or shard.mtime_ns != mtime_ns:
+            shard = _Shard(mtime_ns=mtime_ns)
+            for meta_path in sorted(shard_dir.glob("part-*.json")):
+                with meta_path.open(encoding="utf-8") as f:
+                    meta = json.load(f)
+                path = meta_path.with_suffix("")
+                vectors = np.load(meta_path.with_suffix(".npy"), mmap_mode="r")
+                shard.parts.append(
+                    _Part(
+                        path=path,
+                        vectors=vectors,
+                        ids=meta["ids"],
+                        texts=meta["texts"],
+                        metadatas=meta["metadatas"],
+                        codes=self._load_codes(path, vectors),
+                    )
+                )
+            self._hot[key] = shard
+
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.max_hot_shards:
+            self._hot.popitem(last=False)
+        return shard
+
+    def _shard_keys(self) -> List[str]:
+        return sorted(
+            path.name
+            for path in self.directory.iterdir()
+            if path.is_dir() and not path.name.startswith(".")
+        )
+
+    def _keys_for_filter(self, filter: Optional[dict]) -> List[str]:
+        if filter:
+            return [shard_key(filter)]
+        return self._shard_keys()
+
+    # Writes
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = np.asarray(self._embedding.embed_documents(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+
+        grouped: dict[str, List[int]] = {}
+        for row, metadata in enumerate(metadatas):
+            grouped.setdefault(shard_key(metadata), []).append(row)
+
+        with self._lock:
+            for key, rows in grouped.items():
+                # Upsert: drop previous versions of these ids first
+                self._delete_ids_in_shard(key, {ids[row] for row in rows})
+                self._write_part(
+                    key,
+                    vectors[rows],
+                    [ids[row] for row in rows],
+                    [texts[row] for row in rows],
+                    [metadatas[row] for row in rows],
+                )
+                self._hot.pop(key, None)
+        return ids
+
+    def _delete_ids_in_shard(self, key: str, ids: set) -> None:
+        shard = self._load_shard(key)
+        if shard is None:
+            return
+        for part in shard.parts:
+            keep = [i for i, id in enumerate(part.ids) if id not in ids]
+            if len(keep) == len(part.ids):
+                continue
+            if keep:
+                self._write_part(
+                    key,
+                    np.asarray(part.vectors[keep]),
+                    [part.ids[i] for i in keep],
+                    [part.texts[i] for i in keep],
+                    [part.metadatas[i] for i in keep],
+                )
+            self._remove_part(part)
+        self._hot.pop(key, None)
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> None:
+        with self._lock:
+            if where:
+                key = shard_key(where)
+                shutil.rmtree(self._shard_dir(key), ignore_errors=True)
+                self._hot.pop(key, None)
+            if ids:
+                by_key: dict[Optional[str], set] = {}
+                for id in ids:
+                    by_key.setdefault(shard_key_from_chunk_id(id), set()).add(id)
+                for key, key_ids in by_key.items():
+                    keys = [key] if key is not None else self._shard_keys()
+                    for shard in keys:
+                        self._delete_ids_in_shard(shard, key_ids)
+
+    def compact(self, keys: Optional[List[str]] = None) -> None:
+        """Merge each shard's parts (all shards by default) into a single part."""
+        with self._lock:
+            for key in keys if keys is not None else self._shard_keys():
+                shard = self._load_shard(key)
+                if shard is None or len(shard.parts) <= 1:
+                    continue
+                self._write_part(
+                    key,
+                    np.concatenate([np.asarray(p.vectors) for p in shard.parts]),
+                    [id for p in shard.parts for id in p.ids],
+                    [text for p in shard.parts for text in p.texts],
+                    [metadata for p in shard.parts for metadata in p.metadatas],
+                )
+                for part in shard.parts:
+                    self._remove_part(part)
+                self._hot.pop(key, None)
+
+    # Reads
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Optional[List[str]] = None,
+    ) -> dict[str, Any]:
+        """Chroma-compatible listing of stored chunks."""
+        wanted = set(ids) if ids else None
+        result: dict[str, list] = {"ids": [], "metadatas": [], "documents": []}
+        skip = offset or 0
+        with self._lock:
+            for key in self._keys_for_filter(where):
+                shard = self._load_shard(key)
+                for part in shard.parts if shard else []:
+                    for id, text, metadata in zip(part.ids, part.texts, part.metadatas):
+                        if wanted is not None and id not in wanted:
+                            continue
+                        if skip:
+                            skip -= 1
+                            continue
+                        if limit is not None and len(result["ids"]) >= limit:
+                            return result
+                        result["ids"].append(id)
+                        result["metadatas"].append(metadata)
+                        result["documents"].append(text)
+        return result
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None
+    ) -> List[Tuple[Document, float]]:
+        # A copy: the caller's array must not come back normalized
+        query = np.array(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1
+        candidates: List[Tuple[float, _Part, int]] = []
+        with self._lock:
+            for key in self._keys_for_filter(filter):
+                shard = self._load_shard(key)
+                for part in shard.parts if shard else []:
+                    candidates.extend(
+                        (score, part, i)
+                        for i, score in self._search_part(part, query, k)
+                    )
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        return [
+            (
+                Document(
+                    id=part.ids[i],
+                    page_content=part.texts[i],
+                    metadata=part.metadatas[i],
+                ),
+                score,
+            )
+            for score, part, i in candidates[:k]
+        ]
+
+    def _search_part(
+        self, part: _Part, query: np.ndarray, k: int
+    ) -> List[Tuple[int, float]]:
+        if part.codes is None:
+            scores = part.vectors @ query
+            rows = np.arange(len(scores))
+        else:
+            approximate = approximate_scores(part.codes, query, self.quantization)
+            shortlist = min(k * self.rescore_factor, len(approximate))
+            if shortlist == 0:
+                return []
+            rows = np.argpartition(-approximate, shortlist - 1)[:shortlist]
+            # Sorted rows keep the reads from the memory map sequential
+            rows.sort()
+            scores = part.vectors[rows] @ query
+        top = min(k, len(scores))
+        if top == 0:
+            return []
+        best = np.argpartition(-scores, top - 1)[:top]
+        return [(int(rows[i]), float(scores[i])) for i in best]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return [
+            doc
+            for doc, _ in self.similarity_search_by_vector_with_score(
+                embedding, k=k, filter=filter
+            )
+        ]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(
+            self._embedding.embed_query(query), k=k, filter=filter
+        )
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            doc
+            for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)
+        ]
+
+    def _select_relevance_score_fn(self):
+        # Scores are cosine similarities in [-1, 1]
+        return lambda score: (score + 1) / 2
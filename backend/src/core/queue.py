@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from celery import Celery
+
+from src.core.config import settings
+
+
+celery_app = Celery(
+    "multistep_rag",
+    broker=settings.CELERY_BROKER_URL,
+    backend=settings.CELERY_RESULT_BACKEND,
+    include=["src.tasks.ingestion"],
+)
+celery_app.conf.update(
+    worker_concurrency=settings.INGESTION_CONCURRENCY,
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+)
+
+
+class LocalBroker:
+    """In-process job runner used instead of Celery for tests and local runs."""
+
+    def __init__(self, concurrency: int) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="ingestion"
+        )
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any):
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+local_broker = LocalBroker(concurrency=settings.INGESTION_CONCURRENCY)
@@ -0,0 +1,358 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import BaseMessage
+
+from src.core.config import settings
+from src.core.embedding_batcher import is_rate_limited
+from src.utils.token_utils import get_token_counter
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first: chat never queues behind a document upload
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+class TokenBucket:
+    """Refills ``per_minute`` units evenly over a minute, up to one minute's worth."""
+
+    def __init__(self, per_minute: int) -> None:
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # Larger than the bucket: wait for a full bucket rather than forever
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+    def give_back(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+    def pause(self, seconds: float) -> None:
+        self.level = min(self.level, -seconds * self.rate)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    enqueued: float = field(compare=False)
+    notify: Callable[[], None] = field(compare=False)
+    cancelled: bool = field(default=False, compare=False)
+    granted: bool = field(default=False, compare=False)
+
+
+class _WaitStats:
+    def __init__(self) -> None:
+        self.granted = 0
+        self.queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def add(self, wait: float) -> None:
+        self.granted += 1
+        if wait > 0:
+            self.queued += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+
+class ProviderLimiter:
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int) -> None:
+        self.buckets: List[tuple[TokenBucket, bool]] = []
+        if requests_per_minute:
+            self.buckets.append((TokenBucket(requests_per_minute), False))
+        if tokens_per_minute:
+            self.buckets.append((TokenBucket(tokens_per_minute), True))
+        self.waiters: List[_Waiter] = []
+        self.stats = {priority: _WaitStats() for priority in PRIORITY_NAMES}
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        for bucket, _ in self.buckets:
+            bucket.refill(now)
+        return max(
+            (
+                bucket.wait_time(tokens if by_tokens else 1)
+                for bucket, by_tokens in self.buckets
+            ),
+            default=0.0,
+        )
+
+    def take(self, tokens: int) -> None:
+        for bucket, by_tokens in self.buckets:
+            bucket.take(tokens if by_tokens else 1)
+
+    def give_back(self, tokens: int) -> None:
+        for bucket, by_tokens in self.buckets:
+            bucket.give_back(tokens if by_tokens else 1)
+
+    def dispatch(self, now: float) -> Optional[float]:
+        """Grant queued waiters in priority order.
+
+        Returns the seconds until the first waiter left can go, or None when
+        the queue is empty.
+        """
+        while self.waiters:
+            waiter = self.waiters[0]
+            if waiter.cancelled:
+                heapq.heappop(self.waiters)
+                continue
+            wait = self.wait_time(waiter.tokens, now)
+            if wait > 0:
+                return wait
+            heapq.heappop(self.waiters)
+            self.take(waiter.tokens)
+            waiter.granted = True
+            self.stats[waiter.priority].add(now - waiter.enqueued)
+            waiter.notify()
+        return None
+
+
+class RateLimitScheduler:
+    """Process-wide request and token budgets per LLM provider.
+
+    Callers reserve one request and an estimate of their tokens before calling
+    a provider. When the budget is spent they queue, interactive work ahead of
+    background work, instead of getting a 429 back. A dispatcher thread hands
+    out the budget as the buckets refill, so sync (ingestion threads) and
+    async (chat) callers share the same queue.
+    """
+
+    def __init__(self, limits: Dict[str, tuple[int, int]]) -> None:
+        self._limiters = {
+            provider: ProviderLimiter(rpm, tpm)
+            for provider, (rpm, tpm) in limits.items()
+            if rpm or tpm
+        }
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._dispatcher: Optional[threading.Thread] = None
+
+    def _try_acquire(self, limiter: ProviderLimiter, tokens: int, priority: int):
+        # Caller holds the lock. Only skips the queue when nobody is waiting.
+        now = time.monotonic()
+        if not limiter.waiters and limiter.wait_time(tokens, now) == 0:
+            limiter.take(tokens)
+            limiter.stats[priority].add(0.0)
+            return True
+        return False
+
+    def _enqueue(
+        self,
+        limiter: ProviderLimiter,
+        tokens: int,
+        priority: int,
+        notify: Callable[[], None],
+    ) -> _Waiter:
+        waiter = _Waiter(priority, next(self._seq), tokens, time.monotonic(), notify)
+        heapq.heappush(limiter.waiters, waiter)
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(
+                target=self._dispatch_forever, name="rate-limiter", daemon=True
+            )
+            self._dispatcher.start()
+        self._cond.notify_all()
+        return waiter
+
+    def _dispatch_forever(self) -> None:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                waits = [
+                    wait
+                    for limiter in self._limiters.values()
+                    if (wait := limiter.dispatch(now)) is not None
+                ]
+                self._cond.wait(min(waits) if waits else None)
+
+    def acquire(self, provider: str, tokens: int, priority: int = BACKGROUND) -> None:
+        """Block the calling thread until the provider has budget for the call."""
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            return
+        granted = threading.Event()
+        with self._cond:
+            if self._try_acquire(limiter, tokens, priority):
+                return
+            self._enqueue(limiter, tokens, priority, granted.set)
+        granted.wait()
+
+    async def aacquire(
+        self, provider: str, tokens: int, priority: int = INTERACTIVE
+    ) -> None:
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            return
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def notify() -> None:
+            try:
+                loop.call_soon_threadsafe(
+                    lambda: granted.done() or granted.set_result(None)
+                )
+            except RuntimeError:
+                # The waiting loop is gone (shutdown), nobody to wake
+                pass
+
+        with self._cond:
+            if self._try_acquire(limiter, tokens, priority):
+                return
+            waiter = self._enqueue(limiter, tokens, priority, notify)
+        try:
+            await granted
+        except asyncio.CancelledError:
+            with self._cond:
+                if waiter.granted:
+                    # Granted while being cancelled, the budget goes unused
+                    limiter.give_back(tokens)
+                else:
+                    waiter.cancelled = True
+                self._cond.notify_all()
+            raise
+
+    def penalize(self, provider: str, seconds: float) -> None:
+        """The provider answered 429 anyway: hold all its callers back."""
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            return
+        with self._cond:
+            now = time.monotonic()
+            for bucket, _ in limiter.buckets:
+                bucket.refill(now)
+                bucket.pause(seconds)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        stats = {}
+        with self._cond:
+            now = time.monotonic()
+            for provider, limiter in self._limiters.items():
+                provider_stats = {}
+                for bucket, by_tokens in limiter.buckets:
+                    bucket.refill(now)
+                    name = "tokens" if by_tokens else "requests"
+                    provider_stats[f"{name}_available"] = int(max(bucket.level, 0))
+                for priority, name in PRIORITY_NAMES.items():
+                    wait_stats = limiter.stats[priority]
+                    provider_stats[name] = {
+                        "queue_depth": sum(
+                            1
+                            for waiter in limiter.waiters
+                            if waiter.priority == priority and not waiter.cancelled
+                        ),
+                        "granted": wait_stats.granted,
+                        "queued": wait_stats.queued,
+                        "avg_wait_ms": (
+                            round(wait_stats.total_wait / wait_stats.queued * 1000, 1)
+                            if wait_stats.queued
+                            else 0
+                        ),
+                        "max_wait_ms": round(wait_stats.max_wait * 1000, 1),
+                    }
+                stats[provider] = provider_stats
+        return stats
+
+
+def estimate_chat_tokens(messages: Sequence[BaseMessage], model: str) -> int:
+    """Prompt tokens plus the completion allowance providers count up front."""
+    counter = get_token_counter(model)
+    prompt = sum(counter.count(str(message.content)) for message in messages)
+    return prompt + settings.RATE_LIMIT_COMPLETION_TOKENS
+
+
+def retry_after(exc: BaseException, default: float = 2.0) -> float:
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else default
+    except ValueError:
+        return default
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """Embeddings wrapper that reserves provider budget for every request.
+
+    Document batches come from ingestion and queue as background work; query
+    embeddings serve chat and go first.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        scheduler: RateLimitScheduler,
+        provider: str,
+        model: str,
+    ) -> None:
+        self.embeddings = embeddings
+        self.scheduler = scheduler
+        self.provider = provider
+        self.model = model
+
+    def _count(self, texts: List[str]) -> int:
+        counter = get_token_counter(self.model)
+        return sum(counter.count(text) for text in texts)
+
+    def _rate_limited(self, exc: BaseException) -> None:
+        if is_rate_limited(exc):
+            self.scheduler.penalize(self.provider, retry_after(exc))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.scheduler.acquire(self.provider, self._count(texts), BACKGROUND)
+        try:
+            return self.embeddings.embed_documents(texts)
+        except Exception as exc:
+            self._rate_limited(exc)
+            raise
+
+    def embed_query(self, text: str) -> List[float]:
+        self.scheduler.acquire(self.provider, self._count([text]), INTERACTIVE)
+        try:
+            return self.embeddings.embed_query(text)
+        except Exception as exc:
+            self._rate_limited(exc)
+            raise
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Only reached for query batches, ingestion embeds synchronously
+        await self.scheduler.aacquire(self.provider, self._count(texts), INTERACTIVE)
+        try:
+            return await self.embeddings.aembed_documents(texts)
+        except Exception as exc:
+            self._rate_limited(exc)
+            raise
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await self.scheduler.aacquire(self.provider, self._count([text]), INTERACTIVE)
+        try:
+            return await self.embeddings.aembed_query(text)
+        except Exception as exc:
+            self._rate_limited(exc)
+            raise
+
+
+rate_limiter = RateLimitScheduler(
+    {
+        "openai": (settings.OPENAI_RPM, settings.OPENAI_TPM),
+        "gemini": (settings.GEMINI_RPM, settings.GEMINI_TPM),
+    }
+)
@@ -0,0 +1,106 @@
+import asyncio
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, Dict, Hashable, List, Optional
+
+from src.core.config import settings
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.parts: List[str] = []
+        self.changed = asyncio.Event()
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        # A fresh event per change, so no subscriber can clear it for another
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class SingleFlight:
+    """Runs one producer per key however many callers ask for it at once.
+
+    Producers are async iterators of text parts. Callers that join late get
+    the parts produced so far replayed, then the rest as they arrive. The
+    producer runs as its own task and is cancelled only once every caller
+    has gone away, so one client disconnecting does not fail the others.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.started = 0
+        self.joined = 0
+
+    async def stream(
+        self, key: Hashable, produce: Callable[[], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._run(key, flight, produce()))
+            self.started += 1
+        else:
+            self.joined += 1
+
+        flight.subscribers += 1
+        try:
+            sent = 0
+            while True:
+                changed = flight.changed
+                while sent < len(flight.parts):
+                    yield flight.parts[sent]
+                    sent += 1
+                if flight.done:
+                    break
+                await changed.wait()
+            if flight.error is not None:
+                raise flight.error
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Unlisted right away: a caller arriving before the task sees
+                # the cancellation must start a new flight, not join this one
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    async def do(self, key: Hashable, produce: Callable[[], AsyncIterator[str]]) -> str:
+        return "".join([part async for part in self.stream(key, produce)])
+
+    async def _run(
+        self, key: Hashable, flight: _Flight, parts: AsyncIterator[str]
+    ) -> None:
+        try:
+            async with aclosing(parts):
+                async for part in parts:
+                    flight.parts.append(part)
+                    flight.notify()
+        except asyncio.CancelledError as exc:
+            # Partial output must never pass for a complete answer
+            flight.error = exc
+            raise
+        except Exception as exc:
+            # Handed to every subscriber instead of surfacing on the task
+            flight.error = exc
+        finally:
+            flight.done = True
+            flight.notify()
+            self._forget(key, flight)
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict:
+        total = self.started + self.joined
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "joined": self.joined,
+            "coalesced_rate": round(self.joined / total, 4) if total else 0.0,
+        }
+
+
+rag_singleflight = SingleFlight() if settings.RAG_SINGLEFLIGHT_ENABLED else None
@@ -1,26 +1,126 @@
+import sqlite3
+
+import chromadb
 from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
+from langchain_core.vectorstores import VectorStore
 
+from src.core.chroma_partitions import PartitionedChroma
 from src.core.config import settings
+from src.core.embedding_batcher import EmbeddingBatcher
+from src.core.embedding_cache import (
+    CachedEmbeddings,
+    EmbeddingCache,
+    QueryEmbeddingCache,
+)
+from src.core.fake_providers import HashingEmbeddings, LatencyModel
+from src.core.numpy_store import NumpyVectorStore
+from src.core.rate_limiter import RateLimitedEmbeddings, rate_limiter
 
+if settings.EMBEDDING_BACKEND == "openai":
+    embedding_model = settings.EMBEDDING_MODEL
+    embedding = RateLimitedEmbeddings(
+        OpenAIEmbeddings(model=embedding_model, api_key=settings.OPENAI_API_KEY),
+        scheduler=rate_limiter,
+        provider="openai",
+        model=embedding_model,
+    )
+elif settings.EMBEDDING_BACKEND == "fake":
+    # Own cache key, hashed vectors must never be served as real ones
+    embedding_model = "hashing"
+    embedding = HashingEmbeddings(
+        latency=LatencyModel(
+            settings.FAKE_EMBEDDING_LATENCY_MS,
+            settings.FAKE_LATENCY_SIGMA,
+            settings.FAKE_SEED,
+        )
+    )
+else:
+    raise ValueError(f"Not supported embedding backend: '{settings.EMBEDDING_BACKEND}'")
 
-embedding = OpenAIEmbeddings(
-    model="text-embedding-3-small", api_key=settings.OPENAI_API_KEY
-)
+embedding_cache = None
+if settings.EMBEDDING_CACHE_ENABLED:
+    embedding_cache = EmbeddingCache(
+        path=settings.EMBEDDING_CACHE_PATH,
+        max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+    )
+
+query_embedding_cache = None
+if settings.QUERY_EMBEDDING_CACHE_ENABLED:
+    query_embedding_cache = QueryEmbeddingCache(
+        max_entries=settings.QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+        shared=embedding_cache if settings.QUERY_EMBEDDING_CACHE_SHARED else None,
+    )
+
+if embedding_cache or query_embedding_cache:
+    embedding = CachedEmbeddings(
+        embedding,
+        model=embedding_model,
+        cache=embedding_cache,
+        query_cache=query_embedding_cache,
+    )
 
-chroma_config = {
-    "collection_name": "documents",
-    "embedding_function": embedding,
-}
-
-if not settings.CHROMA_PERSIST:
-    chroma_config.update(
-        {
-            "host": settings.CHROMA_HOST,
-            "port": settings.CHROMA_PORT,
-        }
+
+def create_chroma_client() -> chromadb.ClientAPI:
+    if not settings.CHROMA_PERSIST:
+        return chromadb.HttpClient(
+            host=settings.CHROMA_HOST, port=settings.CHROMA_PORT
+        )
+    return chromadb.PersistentClient(path=str(settings.CHROMA_PERSIST_DIRECTORY))
+
+
+def create_chroma_store(client: chromadb.ClientAPI) -> Chroma:
+    return Chroma(
+        client=client, collection_name="documents", embedding_function=embedding
+    )
+
+
+if settings.VECTOR_BACKEND == "chroma":
+    chroma_client = create_chroma_client()
+    if settings.CHROMA_PARTITIONING == "none":
+        vector_store: VectorStore = create_chroma_store(chroma_client)
+    elif settings.CHROMA_PARTITIONING == "document":
+        vector_store = PartitionedChroma(
+            client=chroma_client,
+            embedding=embedding,
+            max_open_collections=settings.CHROMA_OPEN_COLLECTIONS,
+        )
+    else:
+        raise ValueError(
+            f"Not supported Chroma partitioning: '{settings.CHROMA_PARTITIONING}'"
+        )
+elif settings.VECTOR_BACKEND == "numpy":
+    vector_store = NumpyVectorStore(
+        embedding=embedding,
+        directory=settings.NUMPY_STORE_DIRECTORY,
+        max_hot_shards=settings.NUMPY_STORE_HOT_SHARDS,
+        quantization=settings.NUMPY_STORE_QUANTIZATION,
+        rescore_factor=settings.NUMPY_STORE_RESCORE_FACTOR,
     )
 else:
-    chroma_config.update({"persist_directory": "chroma_db"})
+    raise ValueError(f"Not supported vector backend: '{settings.VECTOR_BACKEND}'")
 
-vector_store = Chroma(**chroma_config)
+
+def compact_vector_store() -> bool:
+    """Reclaim space left by deleted vectors.
+
+    Returns False when Chroma runs as a server, which compacts on its own.
+    """
+    if isinstance(vector_store, NumpyVectorStore):
+        vector_store.compact()
+        return True
+    if not settings.CHROMA_PERSIST:
+        return False
+    with sqlite3.connect(settings.CHROMA_PERSIST_DIRECTORY / "chroma.sqlite3") as conn:
+        conn.execute("VACUUM")
+    return True
+
+
+embedding_batcher = EmbeddingBatcher(
+    model=settings.EMBEDDING_MODEL,
+    max_tokens_per_batch=settings.EMBEDDING_MAX_TOKENS_PER_REQUEST,
+    max_items_per_batch=settings.EMBEDDING_MAX_INPUTS_PER_REQUEST,
+    concurrency=settings.EMBEDDING_CONCURRENCY,
+    max_retries=settings.EMBEDDING_MAX_RETRIES,
+)
@@ -0,0 +1,25 @@
+import re
+from typing import Optional
+
+CHUNK_ID_PATTERN = re.compile(r"^doc_(?P<key>.+)_chunk_\d+$")
+
+
+def shard_key(metadata: dict) -> str:
+    """Key a document's chunks are stored, searched and deleted under.
+
+    Documents with identical content share their chunks, so the content hash
+    wins over the document id, which only remains for legacy uploads.
+    """
+    key = metadata.get("content_hash") or metadata.get("document_id")
+    if key is None:
+        raise ValueError("Chunk metadata needs a 'content_hash' or 'document_id'")
+    return str(key)
+
+
+def chunk_id(key: str | int, chunk_idx: int) -> str:
+    return f"doc_{key}_chunk_{chunk_idx}"
+
+
+def shard_key_from_chunk_id(id: str) -> Optional[str]:
+    match = CHUNK_ID_PATTERN.match(id)
+    return match["key"] if match else None
@@ -1,5 +1,7 @@
 from typing import Generic, TypeVar, Type, Optional, List, cast, Dict, Any
 from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from src.models.base_model import Base
 
@@ -83,3 +85,82 @@ class BaseCRUD(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         if obj is None:
             return None
         return self.delete(db_obj=obj)
+
+
+class AsyncBaseCRUD(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    def __init__(self, model: Type[ModelType], session: AsyncSession):
+        """Initialize CRUD with SQLAlchemy model and an async session."""
+        self.model = model
+        self.session = session
+
+    async def get_by_id(self, id: int) -> Optional[ModelType]:
+        """Get a record by ID."""
+        return await self.session.get(self.model, id)
+
+    async def get_all(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        filters: Optional[Dict[str, Any]] = None,
+        order_by: Optional[str] = None,
+        desc: bool = False,
+    ) -> List[ModelType]:
+        """Get all records with pagination."""
+        if filters is None:
+            filters = {}
+
+        query = select(self.model).filter_by(**filters)
+
+        if order_by:
+            if hasattr(self.model, order_by):
+                order_field = getattr(self.model, order_by)
+                if desc:
+                    query = query.order_by(order_field.desc())
+                else:
+                    query = query.order_by(order_field)
+
+        result = await self.session.scalars(query.offset(skip).limit(limit))
+        return list(result.all())
+
+    async def create(self, obj_in: CreateSchemaType) -> ModelType:
+        """Create a new record."""
+        obj_data = obj_in.model_dump()
+        db_obj = cast(ModelType, self.model())
+        for field, value in obj_data.items():
+            setattr(db_obj, field, value)
+        self.session.add(db_obj)
+        await self.session.commit()
+        await self.session.refresh(db_obj)
+        return db_obj
+
+    async def update(self, db_obj: ModelType, obj_in: UpdateSchemaType) -> ModelType:
+        """Update an existing record."""
+        obj_data = obj_in.model_dump(exclude_unset=True)
+        for field, value in obj_data.items():
+            setattr(db_obj, field, value)
+        self.session.add(db_obj)
+        await self.session.commit()
+        await self.session.refresh(db_obj)
+        return db_obj
+
+    async def update_by_id(
+        self, id: int, obj_in: UpdateSchemaType
+    ) -> Optional[ModelType]:
+        """Update a record by ID."""
+        db_obj = await self.session.get(self.model, id)
+        if db_obj is None:
+            return None
+        return await self.update(db_obj=db_obj, obj_in=obj_in)
+
+    async def delete(self, db_obj: ModelType) -> Optional[ModelType]:
+        """Delete a record."""
+        await self.session.delete(db_obj)
+        await self.session.commit()
+        return db_obj
+
+    async def delete_by_id(self, id: int) -> Optional[ModelType]:
+        """Delete a record by ID."""
+        obj = await self.session.get(self.model, id)
+        if obj is None:
+            return None
+        return await self.delete(db_obj=obj)
@@ -1,9 +1,15 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .base_crud import BaseCRUD
+from .base_crud import AsyncBaseCRUD, BaseCRUD
 from src.models.chat_models import Conversation
 
 
 class ConversationCRUD(BaseCRUD):
     def __init__(self, session: Session):
         super().__init__(Conversation, session)
+
+
+class AsyncConversationCRUD(AsyncBaseCRUD):
+    def __init__(self, session: AsyncSession):
+        super().__init__(Conversation, session)
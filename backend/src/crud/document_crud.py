@@ -1,8 +1,62 @@
+from typing import Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from .base_crud import BaseCRUD
-from src.models.document_model import Document
+from .base_crud import AsyncBaseCRUD, BaseCRUD
+from src.models.document_model import Document, DocumentStatus
 
 
 class DocumentCRUD(BaseCRUD):
     def __init__(self, session: Session):
         super().__init__(Document, session)
+
+    def get_indexed_by_content_hash(self, content_hash: str) -> Optional[Document]:
+        return self.session.scalar(
+            select(self.model)
+            .where(
+                self.model.content_hash == content_hash,
+                self.model.status == DocumentStatus.COMPLETED,
+            )
+            .limit(1)
+        )
+
+    def get_active_by_content_hash(
+        self, content_hash: str, exclude_id: int
+    ) -> Optional[Document]:
+        """Another document with this content that is being or was embedded."""
+        return self.session.scalar(
+            select(self.model)
+            .where(
+                self.model.content_hash == content_hash,
+                self.model.id != exclude_id,
+                self.model.status.in_(
+                    [DocumentStatus.PROCESSING, DocumentStatus.COMPLETED]
+                ),
+            )
+            .order_by(self.model.status == DocumentStatus.PROCESSING)
+            .limit(1)
+        )
+
+
+class AsyncDocumentCRUD(AsyncBaseCRUD):
+    def __init__(self, session: AsyncSession):
+        super().__init__(Document, session)
+
+    async def get_indexed_by_content_hash(
+        self, content_hash: str
+    ) -> Optional[Document]:
+        return await self.session.scalar(
+            select(self.model)
+            .where(
+                self.model.content_hash == content_hash,
+                self.model.status == DocumentStatus.COMPLETED,
+            )
+            .limit(1)
+        )
+
+    async def count_by_content_hash(self, content_hash: str) -> int:
+        return await self.session.scalar(
+            select(func.count())
+            .select_from(self.model)
+            .where(self.model.content_hash == content_hash)
+        )
@@ -1,9 +1,37 @@
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .base_crud import BaseCRUD
+from .base_crud import AsyncBaseCRUD, BaseCRUD
 from src.models.chat_models import Message
 
 
 class MessageCRUD(BaseCRUD):
     def __init__(self, session: Session):
         super().__init__(Message, session)
+
+
+class AsyncMessageCRUD(AsyncBaseCRUD):
+    def __init__(self, session: AsyncSession):
+        super().__init__(Message, session)
+
+    async def get_after(
+        self,
+        conversation_id: int,
+        after_id: int,
+        limit: Optional[int] = None,
+        newest: bool = False,
+    ) -> List[Message]:
+        """Get the messages of a conversation with an id above ``after_id``.
+
+        Returned oldest first. With ``newest`` the limit keeps the latest
+        messages instead of the earliest ones.
+        """
+        query = select(Message).where(
+            Message.conversation_id == conversation_id, Message.id > after_id
+        )
+        query = query.order_by(Message.id.desc() if newest else Message.id)
+        messages = list((await self.session.scalars(query.limit(limit))).all())
+        return messages[::-1] if newest else messages
@@ -1,6 +1,8 @@
 from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from .base_crud import BaseCRUD
+from .base_crud import AsyncBaseCRUD, BaseCRUD
 from src.models.user_model import User
 
 
@@ -10,3 +12,13 @@ class UserCRUD(BaseCRUD):
 
     def get_by_email(self, email: str) -> Optional[User]:
         return self.session.query(self.model).filter(self.model.email == email).first()
+
+
+class AsyncUserCRUD(AsyncBaseCRUD):
+    def __init__(self, session: AsyncSession):
+        super().__init__(User, session)
+
+    async def get_by_email(self, email: str) -> Optional[User]:
+        return await self.session.scalar(
+            select(self.model).where(self.model.email == email)
+        )
@@ -1,45 +1,60 @@
-from typing import Annotated, Generator
+from typing import Annotated, AsyncGenerator, Generator
 from fastapi import Depends, status, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session, sessionmaker
-from langchain_chroma import Chroma
-
-from src.core.db import engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from langchain_core.vectorstores import VectorStore
+
+from src.core.answer_cache import answer_cache
+from src.core.db import AsyncSessionLocal, SessionLocal
+from src.core.llm_clients import llm_registry
+from src.core.llm_router import generation_router
+from src.core.singleflight import rag_singleflight
 from src.models.user_model import User
-from src.crud.user_crud import UserCRUD
-from src.crud.document_crud import DocumentCRUD
-from src.crud.conversation_crud import ConversationCRUD
-from src.crud.message_crud import MessageCRUD
+from src.crud.user_crud import AsyncUserCRUD
+from src.crud.document_crud import AsyncDocumentCRUD
+from src.crud.conversation_crud import AsyncConversationCRUD
+from src.crud.message_crud import AsyncMessageCRUD
 from src.services.auth_service import AuthService
 from src.services.document_service import DocumentService
 from src.services.vectorization_service import VectorizationService
 from src.services.chat_service import ChatService
+from src.services.memory_service import memory_service
+from src.services.multistep_service import MultiStepRetriever
 from src.services.rag_service import RagService
 from src.core.security import JWTBearer
 from src.core.config import settings
-from src.core.store import vector_store
+from src.core.store import embedding_batcher, vector_store
 
 
 def get_db() -> Generator[Session, None, None]:
-    session = sessionmaker(bind=engine, expire_on_commit=False)
-    with session() as session:
+    # FastAPI caches this dependency per request, so every CRUD built for the
+    # same request shares this session and its pooled connection.
+    with SessionLocal() as session:
+        yield session
+
+
+DatabaseSession = Annotated[Session, Depends(get_db)]
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as session:
         yield session
-    engine.dispose()
 
 
-DatabaseSession = Annotated[Generator[Session, None, None], Depends(get_db)]
+AsyncDatabaseSession = Annotated[AsyncSession, Depends(get_async_db)]
 
 
-def get_user_crud(db: Session = Depends(get_db)) -> UserCRUD:
-    return UserCRUD(db)
+def get_user_crud(db: AsyncDatabaseSession) -> AsyncUserCRUD:
+    return AsyncUserCRUD(db)
 
 
-UserCRUDDep = Annotated[UserCRUD, Depends(get_user_crud)]
+UserCRUDDep = Annotated[AsyncUserCRUD, Depends(get_user_crud)]
 
 
 def get_auth_service(
-    user_crud: UserCRUD = Depends(get_user_crud),
+    user_crud: UserCRUDDep,
 ):
     return AuthService(user_crud=user_crud)
 
@@ -48,7 +63,7 @@ AuthServiceDep = Annotated[AuthService, Depends(get_auth_service)]
 JWTDep = Annotated[HTTPAuthorizationCredentials, Depends(JWTBearer())]
 
 
-def get_current_user(
+async def get_current_user(
     user_crud: UserCRUDDep,
     token: JWTDep,
 ) -> User:
@@ -61,7 +76,7 @@ def get_current_user(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Could not validate credentials",
         )
-    current_user = user_crud.get_by_id(payload["sub"])
+    current_user = await user_crud.get_by_id(int(payload["sub"]))
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="User not found."
@@ -72,11 +87,11 @@ def get_current_user(
 CurrentUserDep = Annotated[User, Depends(get_current_user)]
 
 
-def get_document_crud(db: Session = Depends(get_db)):
-    return DocumentCRUD(db)
+def get_async_document_crud(db: AsyncDatabaseSession) -> AsyncDocumentCRUD:
+    return AsyncDocumentCRUD(db)
 
 
-DocumentCRUDDep = Annotated[DocumentCRUD, Depends(get_document_crud)]
+AsyncDocumentCRUDDep = Annotated[AsyncDocumentCRUD, Depends(get_async_document_crud)]
 
 
 def pagination_params(
@@ -89,17 +104,19 @@ def pagination_params(
 PaginationParamsDep = Annotated[dict, Depends(pagination_params)]
 
 
-def get_vector_store() -> Chroma:
+def get_vector_store() -> VectorStore:
     return vector_store
 
 
-VectorStoreDep = Annotated[Chroma, Depends(get_vector_store)]
+VectorStoreDep = Annotated[VectorStore, Depends(get_vector_store)]
 
 
 def get_vectorization_service(
     vector_store: VectorStoreDep,
 ) -> VectorizationService:
-    return VectorizationService(vector_store=vector_store)
+    return VectorizationService(
+        vector_store=vector_store, embedding_batcher=embedding_batcher
+    )
 
 
 VectorizationServiceDep = Annotated[
@@ -108,7 +125,7 @@ VectorizationServiceDep = Annotated[
 
 
 def get_document_service(
-    document_crud: DocumentCRUDDep,
+    document_crud: AsyncDocumentCRUDDep,
     document_processor: VectorizationServiceDep,
 ) -> DocumentService:
     return DocumentService(
@@ -120,28 +137,46 @@ DocumentServiceDep = Annotated[DocumentService, Depends(get_document_service)]
 
 
 def get_rag_service(vectorization_service: VectorizationServiceDep) -> RagService:
-    return RagService(vectorization_service=vectorization_service)
+    retriever = MultiStepRetriever(
+        vectorization_service=vectorization_service,
+        llm_registry=llm_registry,
+        planner_model=settings.RAG_PLANNER_MODEL,
+        plan_min_words=settings.RAG_PLAN_MIN_WORDS,
+        max_sub_queries=settings.RAG_MAX_SUB_QUERIES,
+        sub_query_k=settings.RAG_SUB_QUERY_K,
+        refine_max_steps=settings.RAG_REFINE_MAX_STEPS,
+        refine_skip_score=settings.RAG_REFINE_SKIP_SCORE,
+        plan_wait_factor=settings.RAG_PLAN_WAIT_FACTOR,
+        plan_min_wait_ms=settings.RAG_PLAN_MIN_WAIT_MS,
+    )
+    return RagService(
+        vectorization_service=vectorization_service,
+        generation_router=generation_router,
+        retriever=retriever,
+        answer_cache=answer_cache,
+        singleflight=rag_singleflight,
+    )
 
 
 RagServiceDep = Annotated[RagService, Depends(get_rag_service)]
 
 
-def get_conversation_crud(db: Session = Depends(get_db)):
-    return ConversationCRUD(session=db)
+def get_conversation_crud(db: AsyncDatabaseSession) -> AsyncConversationCRUD:
+    return AsyncConversationCRUD(session=db)
 
 
-ConversationCRUDDep = Annotated[ConversationCRUD, Depends(get_conversation_crud)]
+ConversationCRUDDep = Annotated[AsyncConversationCRUD, Depends(get_conversation_crud)]
 
 
-def get_message_crud(db: Session = Depends(get_db)):
-    return MessageCRUD(session=db)
+def get_message_crud(db: AsyncDatabaseSession) -> AsyncMessageCRUD:
+    return AsyncMessageCRUD(session=db)
 
 
-MessageCRUDDep = Annotated[MessageCRUD, Depends(get_message_crud)]
+MessageCRUDDep = Annotated[AsyncMessageCRUD, Depends(get_message_crud)]
 
 
 def get_chat_service(
-    document_crud: DocumentCRUDDep,
+    document_crud: AsyncDocumentCRUDDep,
     conversation_crud: ConversationCRUDDep,
     message_crud: MessageCRUDDep,
     rag_service: RagServiceDep,
@@ -151,6 +186,7 @@ def get_chat_service(
         conversation_crud=conversation_crud,
         message_crud=message_crud,
         rag_service=rag_service,
+        memory_service=memory_service,
     )
 
 
@@ -1,11 +1,23 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from src.core.config import settings
+from src.core.llm_clients import llm_registry
+from src.services.memory_service import memory_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await llm_registry.warmup(settings.LLM_WARMUP_MODELS)
+    yield
+    await memory_service.aclose()
+    await llm_registry.aclose()
 
 
 def create_application() -> FastAPI:
-    app = FastAPI(title=settings.NAME, version=settings.VERSION)
+    app = FastAPI(title=settings.NAME, version=settings.VERSION, lifespan=lifespan)
 
     # Middleware configuration
     app.add_middleware(
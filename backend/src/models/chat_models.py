@@ -22,6 +22,9 @@ class Conversation(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     document_id = Column(Integer, ForeignKey("documents.id"))
     title = Column(String, nullable=False)
+    # Rolling summary of every message up to and including summarized_until_id
+    summary = Column(Text, nullable=True)
+    summarized_until_id = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
@@ -29,6 +29,7 @@ class Document(Base):
     status = Column(SQLAlchemyEnum(DocumentStatus), default=DocumentStatus.PENDING)
     storage_path = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)
+    content_hash = Column(String(64), index=True, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
@@ -8,7 +8,7 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/login", response_model=TokenSchema)
 async def login(request: UserLoginSchema, auth_service: AuthServiceDep):
-    return auth_service.authenticate_user(
+    return await auth_service.authenticate_user(
         email=request.email, password=request.password
     )
 
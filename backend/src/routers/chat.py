@@ -1,6 +1,7 @@
 from typing import List
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Request, status
+from fastapi.responses import StreamingResponse
 
 from src.schemas.chat_schemas import (
     ConversationInDB,
@@ -9,74 +10,107 @@ from src.schemas.chat_schemas import (
     SendMessageRequest,
 )
 from src.dependencies import CurrentUserDep, ChatServiceDep, PaginationParamsDep
+from src.utils.request_utils import cancel_on_disconnect
+from src.utils.sse_utils import SSE_HEADERS, sse_stream
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
 @router.post("/conversations/", response_model=ConversationInDB)
-def create_conversation(
+async def create_conversation(
     request: CreateDocumentConversationRequest,
     user: CurrentUserDep,
     chat_service: ChatServiceDep,
 ):
-    return chat_service.create_conversation(
+    return await chat_service.create_conversation(
         user=user, document_id=request.document_id, title=request.title
     )
 
 
 @router.get("/conversations/", response_model=List[ConversationInDB])
-def list_conversations(
+async def list_conversations(
     document_id: int,
     pagination: PaginationParamsDep,
     user: CurrentUserDep,
     chat_service: ChatServiceDep,
 ):
-    return chat_service.get_document_conversations(
+    return await chat_service.get_document_conversations(
         user=user, document_id=document_id, pagination=pagination
     )
 
 
 @router.get("/conversations/{conversation_id}", response_model=ConversationInDB)
-def get_conversation(
+async def get_conversation(
     conversation_id: int, user: CurrentUserDep, chat_service: ChatServiceDep
 ):
-    return chat_service.get_conversation(user=user, conversation_id=conversation_id)
+    return await chat_service.get_conversation(
+        user=user, conversation_id=conversation_id
+    )
 
 
 @router.delete(
     "/conversations/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT
 )
-def delete_conversation(
+async def delete_conversation(
     conversation_id: int, user: CurrentUserDep, chat_service: ChatServiceDep
 ):
-    return chat_service.delete_conversation(user=user, conversation_id=conversation_id)
+    return await chat_service.delete_conversation(
+        user=user, conversation_id=conversation_id
+    )
 
 
 @router.post("/conversations/{conversation_id}/messages/", response_model=MessageInDB)
-def send_message(
+async def send_message(
+    conversation_id: int,
+    request: SendMessageRequest,
+    http_request: Request,
+    user: CurrentUserDep,
+    chat_service: ChatServiceDep,
+):
+    return await cancel_on_disconnect(
+        http_request,
+        chat_service.send_message(
+            user=user,
+            conversation_id=conversation_id,
+            content=request.content,
+            provider=request.provider,
+            model=request.model,
+        ),
+    )
+
+
+@router.post(
+    "/conversations/{conversation_id}/messages/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def stream_message(
     conversation_id: int,
     request: SendMessageRequest,
     user: CurrentUserDep,
     chat_service: ChatServiceDep,
 ):
-    return chat_service.send_message(
+    events = await chat_service.stream_message(
         user=user,
         conversation_id=conversation_id,
         content=request.content,
         provider=request.provider,
         model=request.model,
     )
+    return StreamingResponse(
+        sse_stream(events), media_type="text/event-stream", headers=SSE_HEADERS
+    )
 
 
 @router.get(
     "/conversations/{conversation_id}/messages/", response_model=List[MessageInDB]
 )
-def list_messages(
+async def list_messages(
     conversation_id: int,
     pagination: PaginationParamsDep,
     user: CurrentUserDep,
     chat_service: ChatServiceDep,
 ):
-    return chat_service.get_conversation_messages(
+    return await chat_service.get_conversation_messages(
         user=user, conversation_id=conversation_id, pagination=pagination
     )
@@ -7,14 +7,14 @@ router = APIRouter(prefix="/documents", tags=["documents"])
 
 
 @router.post(
-    "/upload", status_code=status.HTTP_201_CREATED, response_model=DocumentInDB
+    "/upload", status_code=status.HTTP_202_ACCEPTED, response_model=DocumentInDB
 )
 async def upload_document(
     user: CurrentUserDep,
     document_service: DocumentServiceDep,
     file: UploadFile = File(...),
 ):
-    return document_service.create_document(user=user, file=file)
+    return await document_service.create_document(user=user, file=file)
 
 
 @router.get("/", response_model=list[DocumentInDB])
@@ -23,7 +23,7 @@ async def list_documents(
     document_service: DocumentServiceDep,
     pagination: PaginationParamsDep,
 ):
-    return document_service.list_documents(user=user, pagination=pagination)
+    return await document_service.list_documents(user=user, pagination=pagination)
 
 
 @router.get("/{document_id}", response_model=DocumentInDB)
@@ -32,7 +32,7 @@ async def get_document(
     document_service: DocumentServiceDep,
     document_id: int,
 ):
-    return document_service.get_document(user=user, document_id=document_id)
+    return await document_service.get_document(user=user, document_id=document_id)
 
 
 @router.delete("/{document_id}", response_model=DocumentInDB)
@@ -41,7 +41,7 @@ async def delete_document(
     document_service: DocumentServiceDep,
     document_id: int,
 ):
-    return document_service.delete_document(user=user, document_id=document_id)
+    return await document_service.delete_document(user=user, document_id=document_id)
 
 
 @router.put("/{document_id}", response_model=DocumentInDB)
@@ -51,6 +51,6 @@ async def update_document(
     document_id: int,
     request: DocumentUpdateRequest,
 ):
-    return document_service.update_document(
+    return await document_service.update_document(
         user=user, document_id=document_id, update_data=request
     )
@@ -1,5 +1,13 @@
 from fastapi import APIRouter
 
+from src.core.answer_cache import answer_cache
+from src.core.db import get_pool_stats
+from src.core.llm_clients import llm_registry
+from src.core.llm_router import generation_router
+from src.core.rate_limiter import rate_limiter
+from src.core.singleflight import rag_singleflight
+from src.core.store import embedding_cache, query_embedding_cache
+
 
 router = APIRouter(prefix="/misc", tags=["misc"])
 
@@ -7,3 +15,19 @@ router = APIRouter(prefix="/misc", tags=["misc"])
 @router.get("/health", summary="Health Check")
 async def health_check():
     return {"status": "ok"}
+
+
+@router.get("/metrics", summary="Runtime Metrics")
+async def metrics():
+    return {
+        "db_pool": get_pool_stats(),
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "query_embedding_cache": (
+            query_embedding_cache.stats() if query_embedding_cache else None
+        ),
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+        "llm_clients": llm_registry.stats(),
+        "generation_router": generation_router.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "rag_singleflight": rag_singleflight.stats() if rag_singleflight else None,
+    }
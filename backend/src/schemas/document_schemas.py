@@ -12,6 +12,8 @@ class DocumentCreate(DocumentBase):
     storage_path: str
     owner_id: int
     file_size: int
+    content_hash: Optional[str] = None
+    status: DocumentStatus = DocumentStatus.PENDING
 
 
 class DocumentUpdate(BaseModel):
@@ -1,3 +1,7 @@
+import logging
+from typing import AsyncIterator, Tuple
+
+import anyio
 from fastapi import HTTPException, status
 
 from src.schemas.chat_schemas import (
@@ -6,29 +10,37 @@ from src.schemas.chat_schemas import (
     Role,
     ConversationCreate,
     MessageCreate,
+    MessageInDB,
 )
+from src.core.db import AsyncSessionLocal
+from src.models.document_model import Document
 from src.models.user_model import User
-from src.crud.document_crud import DocumentCRUD
-from src.crud.conversation_crud import ConversationCRUD
-from src.crud.message_crud import MessageCRUD
+from src.crud.document_crud import AsyncDocumentCRUD
+from src.crud.conversation_crud import AsyncConversationCRUD
+from src.crud.message_crud import AsyncMessageCRUD
+from src.services.memory_service import ConversationHistory, MemoryService
 from src.services.rag_service import RagService
 
+logger = logging.getLogger(__name__)
+
 
 class ChatService:
     def __init__(
         self,
-        document_crud: DocumentCRUD,
-        conversation_crud: ConversationCRUD,
-        message_crud: MessageCRUD,
+        document_crud: AsyncDocumentCRUD,
+        conversation_crud: AsyncConversationCRUD,
+        message_crud: AsyncMessageCRUD,
         rag_service: RagService,
+        memory_service: MemoryService,
     ):
         self.document_crud = document_crud
         self.conversation_crud = conversation_crud
         self.message_crud = message_crud
         self.rag_service = rag_service
+        self.memory_service = memory_service
 
-    def create_conversation(self, user: User, document_id: int, title: str):
-        document = self.document_crud.get_by_id(document_id)
+    async def create_conversation(self, user: User, document_id: int, title: str):
+        document = await self.document_crud.get_by_id(document_id)
         if not document or document.owner_id != user.id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
@@ -36,26 +48,26 @@ class ChatService:
         obj_in = ConversationCreate(
             title=title, owner_id=user.id, document_id=document_id
         )
-        conversation = self.conversation_crud.create(obj_in=obj_in)
+        conversation = await self.conversation_crud.create(obj_in=obj_in)
         return conversation
 
-    def get_conversation(self, user: User, conversation_id: int):
-        conversation = self.conversation_crud.get_by_id(conversation_id)
+    async def get_conversation(self, user: User, conversation_id: int):
+        conversation = await self.conversation_crud.get_by_id(conversation_id)
         if not conversation or conversation.owner_id != user.id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Conversation not found"
             )
         return conversation
 
-    def get_document_conversations(
+    async def get_document_conversations(
         self, user: User, document_id: int, pagination: dict
     ):
-        document = self.document_crud.get_by_id(document_id)
+        document = await self.document_crud.get_by_id(document_id)
         if not document or document.owner_id != user.id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
             )
-        conversations = self.conversation_crud.get_all(
+        conversations = await self.conversation_crud.get_all(
             skip=pagination["skip"],
             limit=pagination["limit"],
             filters={"owner_id": user.id, "document_id": document_id},
@@ -64,11 +76,11 @@ class ChatService:
         )
         return conversations
 
-    def get_conversation_messages(
+    async def get_conversation_messages(
         self, user: User, conversation_id: int, pagination: dict
     ):
-        conversation = self.get_conversation(user, conversation_id)
-        messages = self.message_crud.get_all(
+        conversation = await self.get_conversation(user, conversation_id)
+        messages = await self.message_crud.get_all(
             skip=pagination["skip"],
             limit=pagination["limit"],
             filters={"conversation_id": conversation.id},
@@ -77,12 +89,32 @@ class ChatService:
         )
         return messages
 
-    def delete_conversation(self, user: User, conversation_id: int):
-        conversation = self.get_conversation(user, conversation_id)
-        conversation = self.conversation_crud.delete(conversation)
+    async def delete_conversation(self, user: User, conversation_id: int):
+        conversation = await self.get_conversation(user, conversation_id)
+        conversation = await self.conversation_crud.delete(conversation)
         return conversation
 
-    def send_message(
+    async def _prepare_message(
+        self, user: User, conversation_id: int, content: str, model: LLMModel
+    ):
+        conversation = await self.get_conversation(user, conversation_id)
+        # Loaded before storing the new message, which is sent on its own
+        history = await self.memory_service.load_history(
+            self.message_crud, conversation, model
+        )
+
+        obj_in = MessageCreate(
+            content=content, conversation_id=conversation.id, role=Role.USER
+        )
+        message = await self.message_crud.create(obj_in=obj_in)
+
+        document = await self.document_crud.get_by_id(conversation.document_id)
+        # End the read transaction so no pooled connection is held while the
+        # model generates (all CRUDs of a request share this session)
+        await self.message_crud.session.commit()
+        return conversation, message, history, document
+
+    async def send_message(
         self,
         user: User,
         conversation_id: int,
@@ -90,30 +122,11 @@ class ChatService:
         provider: LLMProvider,
         model: LLMModel,
     ):
-        conversation = self.get_conversation(user, conversation_id)
-
-        obj_in = MessageCreate(
-            content=content, conversation_id=conversation.id, role=Role.USER
+        conversation, message, history, document = await self._prepare_message(
+            user, conversation_id, content, model
         )
-        message = self.message_crud.create(obj_in=obj_in)
-
-        history = list(
-            reversed(
-                [
-                    msg.content
-                    for msg in self.message_crud.get_all(
-                        limit=10,
-                        filters={"conversation_id": conversation_id},
-                        order_by="created_at",
-                        desc=True,
-                    )
-                ]
-            )
-        )
-
-        document = self.document_crud.get_by_id(conversation.document_id)
 
-        response = self.rag_service.rag_query(
+        response = await self.rag_service.rag_query(
             message=message.content,
             history=history,
             document=document,
@@ -124,6 +137,80 @@ class ChatService:
         resp_obj_in = MessageCreate(
             content=response, conversation_id=conversation.id, role=Role.ASSISTANT
         )
-        message = self.message_crud.create(obj_in=resp_obj_in)
+        message = await self.message_crud.create(obj_in=resp_obj_in)
+        self.memory_service.schedule_update(conversation.id)
 
         return message
+
+    async def stream_message(
+        self,
+        user: User,
+        conversation_id: int,
+        content: str,
+        provider: LLMProvider,
+        model: LLMModel,
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        """Store the user message and return a stream of ``(event, data)`` pairs.
+
+        Validation happens before this returns, so errors are still plain
+        HTTP responses. The stream emits ``token`` events followed by ``done``
+        with the stored assistant message.
+        """
+        conversation, message, history, document = await self._prepare_message(
+            user, conversation_id, content, model
+        )
+        return self._stream_reply(
+            conversation.id, message.content, history, document, provider, model
+        )
+
+    async def _stream_reply(
+        self,
+        conversation_id: int,
+        content: str,
+        history: ConversationHistory,
+        document: Document,
+        provider: LLMProvider,
+        model: LLMModel,
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        parts = []
+        saved = False
+        try:
+            async for token in self.rag_service.astream_query(
+                message=content,
+                history=history,
+                document=document,
+                provider=provider,
+                model=model,
+            ):
+                parts.append(token)
+                yield "token", {"content": token}
+
+            # Set first: a save that fails, maybe after committing, must not
+            # be repeated by the finally below
+            saved = True
+            with anyio.CancelScope(shield=True):
+                reply = await self._save_reply(conversation_id, "".join(parts))
+            yield "done", MessageInDB.model_validate(reply).model_dump(mode="json")
+        except Exception:
+            logger.exception(
+                "Streaming reply for conversation %s failed", conversation_id
+            )
+            yield "error", {"detail": "Failed to generate a response"}
+        finally:
+            if parts and not saved:
+                # Client went away or the model failed: keep what was generated
+                with anyio.CancelScope(shield=True):
+                    await self._save_reply(conversation_id, "".join(parts))
+
+    async def _save_reply(self, conversation_id: int, content: str):
+        # The request's session is closed once streaming starts
+        async with AsyncSessionLocal() as session:
+            reply = await AsyncMessageCRUD(session).create(
+                obj_in=MessageCreate(
+                    content=content,
+                    conversation_id=conversation_id,
+                    role=Role.ASSISTANT,
+                )
+            )
+        self.memory_service.schedule_update(conversation_id)
+        return reply
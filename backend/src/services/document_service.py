@@ -1,77 +1,86 @@
-import shutil
+from pathlib import Path
 
 from fastapi import HTTPException, UploadFile, status
+from starlette.concurrency import run_in_threadpool
 
+from src.core.answer_cache import answer_cache
+from src.core.blob_store import blob_store
 from src.core.config import settings
 from src.models.user_model import User
 from src.models.document_model import Document, DocumentStatus
-from src.crud.document_crud import DocumentCRUD
+from src.crud.document_crud import AsyncDocumentCRUD
 from src.schemas.document_schemas import (
     DocumentCreate,
-    DocumentUpdate,
     DocumentUpdateRequest,
 )
 from src.services.vectorization_service import VectorizationService
+from src.tasks.ingestion import enqueue_document_ingestion
+from src.utils.upload_utils import FileTooLargeError, save_upload
 
 
 class DocumentService:
     def __init__(
-        self, document_crud: DocumentCRUD, vectorization_service: VectorizationService
+        self,
+        document_crud: AsyncDocumentCRUD,
+        vectorization_service: VectorizationService,
     ) -> None:
         self.document_crud = document_crud
         self.vectorization_service = vectorization_service
 
-    def create_document(self, user: User, file: UploadFile) -> Document:
+    async def create_document(self, user: User, file: UploadFile) -> Document:
         if not file.filename:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="No file uploaded"
             )
 
-        file_path = settings.UPLOAD_DIR / file.filename
+        if Path(file.filename).suffix.lower() not in settings.ALLOWED_FILE_TYPES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="File type not allowed",
+            )
 
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        suffix = Path(file.filename).suffix
+        try:
+            stored = await save_upload(
+                file,
+                staging_dir=settings.UPLOAD_DIR,
+                destination=lambda sha256: blob_store.path_for(sha256, suffix),
+                max_bytes=settings.MAX_FILE_SIZE_MB * 1024 * 1024,
+                chunk_size=settings.UPLOAD_CHUNK_SIZE,
+            )
+        except FileTooLargeError:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File exceeds {settings.MAX_FILE_SIZE_MB} MB",
+            )
 
         doc_create = DocumentCreate(
             filename=file.filename,
-            storage_path=str(file_path),
+            storage_path=str(stored.path),
             owner_id=user.id,
-            file_size=file.size,
+            file_size=stored.size,
+            content_hash=stored.sha256,
         )
-        document = self.document_crud.create(obj_in=doc_create)
-
-        # TODO: This should be in a background task
-        try:
-            self.vectorization_service.process_and_store_document(
-                file_path=str(file_path),
-                metadata={
-                    "document_id": document.id,
-                    "owner_id": user.id,
-                    "filename": file.filename,
-                },
-            )
-        except Exception as e:
-            self.document_crud.delete(document)
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="An error ocurred uploading document",
-            )
+        if await self.document_crud.get_indexed_by_content_hash(stored.sha256):
+            # Same content was already embedded, link to its vectors
+            doc_create.status = DocumentStatus.COMPLETED
+        document = await self.document_crud.create(obj_in=doc_create)
 
-        obj_in = DocumentUpdate(status=DocumentStatus.COMPLETED)
-        self.document_crud.update(document, obj_in)
+        if document.status != DocumentStatus.COMPLETED:
+            await run_in_threadpool(enqueue_document_ingestion, document.id)
 
         return document
 
-    def get_document(self, user: User, document_id: int) -> Document:
-        document = self.document_crud.get_by_id(document_id)
+    async def get_document(self, user: User, document_id: int) -> Document:
+        document = await self.document_crud.get_by_id(document_id)
         if document is None or document.owner_id != user.id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Document not found"
             )
         return document
 
-    def list_documents(self, user: User, pagination: dict) -> list[Document]:
-        return self.document_crud.get_all(
+    async def list_documents(self, user: User, pagination: dict) -> list[Document]:
+        return await self.document_crud.get_all(
             skip=pagination["skip"],
             limit=pagination["limit"],
             filters={"owner_id": user.id},
@@ -79,10 +88,20 @@ class DocumentService:
             desc=False,
         )
 
-    def delete_document(self, user: User, document_id: int) -> Document:
-        document = self.get_document(user=user, document_id=document_id)
-        self.vectorization_service.delete_document_vectors(document_id)
-        deleted_document = self.document_crud.delete(db_obj=document)
+    async def delete_document(self, user: User, document_id: int) -> Document:
+        document = await self.get_document(user=user, document_id=document_id)
+        shared = document.content_hash and (
+            await self.document_crud.count_by_content_hash(document.content_hash) > 1
+        )
+        if not shared:
+            await run_in_threadpool(
+                self.vectorization_service.delete_document_vectors, document
+            )
+            if document.content_hash:
+                blob_store.delete(document.storage_path)
+        if answer_cache:
+            answer_cache.invalidate(document.id)
+        deleted_document = await self.document_crud.delete(db_obj=document)
         if deleted_document is None:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -90,11 +109,11 @@ class DocumentService:
             )
         return deleted_document
 
-    def update_document(
+    async def update_document(
         self, user: User, document_id: int, update_data: DocumentUpdateRequest
     ) -> Document:
-        document = self.get_document(user=user, document_id=document_id)
-        updated_document = self.document_crud.update_by_id(
+        document = await self.get_document(user=user, document_id=document_id)
+        updated_document = await self.document_crud.update_by_id(
             id=document.id, obj_in=update_data
         )
         if updated_document is None:
@@ -102,4 +121,7 @@ class DocumentService:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to update document",
             )
+        if answer_cache:
+            # The filename is part of the prompt
+            answer_cache.invalidate(document.id)
         return updated_document
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Set
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from sqlalchemy import update
+
+from src.core.config import settings
+from src.core.db import AsyncSessionLocal
+from src.core.llm_clients import LLMClientRegistry, llm_registry, parse_model_name
+from src.core.rate_limiter import BACKGROUND, estimate_chat_tokens, rate_limiter
+from src.crud.message_crud import AsyncMessageCRUD
+from src.models.chat_models import Conversation, Message
+from src.schemas.chat_schemas import LLMModel, Role
+from src.utils.token_utils import get_token_counter
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Mantienes la memoria de una conversación entre un usuario y un asistente sobre un documento.
+
+Actualiza el resumen actual incorporando los nuevos mensajes:
+- Conserva las preguntas del usuario, los datos y conclusiones de las respuestas, nombres, cifras y preferencias expresadas.
+- Omite saludos, formato markdown y repeticiones.
+- Escribe en el idioma de la conversación y responde solo con el resumen, en menos de {max_words} palabras.
+"""
+
+
+@dataclass
+class ConversationHistory:
+    summary: Optional[str] = None
+    messages: List[BaseMessage] = field(default_factory=list)
+
+
+class MemoryService:
+    """Rolling conversation summary plus a token-budgeted tail of recent turns.
+
+    Messages newer than ``Conversation.summarized_until_id`` are sent verbatim
+    as long as they fit in ``tail_tokens`` and ``tail_max_messages``. Once they
+    outgrow either, a background task folds the oldest of them into the
+    summary, so the history part of the prompt stays bounded however long the
+    conversation gets.
+    """
+
+    def __init__(
+        self,
+        llm_registry: LLMClientRegistry,
+        summary_model: str,
+        tail_tokens: int,
+        tail_max_messages: int,
+        summary_max_tokens: int,
+    ) -> None:
+        self.llm_registry = llm_registry
+        self.summary_provider, self.summary_model = parse_model_name(summary_model)
+        self.tail_tokens = tail_tokens
+        self.tail_max_messages = tail_max_messages
+        self.summary_max_tokens = summary_max_tokens
+        self._tasks: Set[asyncio.Task] = set()
+        self._running: Set[int] = set()
+        self._stale: Set[int] = set()
+
+    async def load_history(
+        self,
+        message_crud: AsyncMessageCRUD,
+        conversation: Conversation,
+        model: LLMModel,
+    ) -> ConversationHistory:
+        messages = await message_crud.get_after(
+            conversation.id,
+            conversation.summarized_until_id,
+            limit=self.tail_max_messages,
+            newest=True,
+        )
+        return ConversationHistory(
+            summary=conversation.summary,
+            messages=self.build_tail(messages, model),
+        )
+
+    def build_tail(
+        self, messages: Sequence[Message], model: LLMModel
+    ) -> List[BaseMessage]:
+        """Keep the newest messages that fit in the tail budget, with roles."""
+        counter = get_token_counter(model.value)
+        budget = self.tail_tokens
+        tail: List[BaseMessage] = []
+        for message in reversed(messages):
+            content = message.content
+            tokens = counter.count(content)
+            if tokens > budget:
+                if tail:
+                    break
+                # A single oversized answer still gives follow-ups something
+                content = counter.truncate(content, budget)
+                tokens = budget
+            message_cls = HumanMessage if message.role == Role.USER else AIMessage
+            tail.append(message_cls(content=content))
+            budget -= tokens
+        return tail[::-1]
+
+    def schedule_update(self, conversation_id: int) -> None:
+        """Refresh the summary in the background, one task per conversation."""
+        if conversation_id in self._running:
+            self._stale.add(conversation_id)
+            return
+        self._running.add(conversation_id)
+        task = asyncio.create_task(self._run_updates(conversation_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_updates(self, conversation_id: int) -> None:
+        try:
+            while True:
+                self._stale.discard(conversation_id)
+                try:
+                    await self.update_summary(conversation_id)
+                except Exception:
+                    logger.exception(
+                        "Updating summary of conversation %s failed", conversation_id
+                    )
+                if conversation_id not in self._stale:
+                    break
+        finally:
+            self._running.discard(conversation_id)
+
+    def fold_count(self, tokens: Sequence[int]) -> int:
+        """How many of the oldest unsummarized messages to fold into the summary.
+
+        ``tokens`` holds the size of each message, oldest first. Nothing is
+        folded while the tail fits both the token budget and the message cap
+        of ``load_history``, which would otherwise drop the oldest ones.
+        """
+        if sum(tokens) <= self.tail_tokens and len(tokens) <= self.tail_max_messages:
+            return 0
+        # Keep the latest message and up to half of each limit verbatim, so
+        # the next fold is a few turns away
+        kept, keep_tokens = len(tokens) - 1, tokens[-1]
+        while (
+            kept > 0
+            and keep_tokens + tokens[kept - 1] <= self.tail_tokens // 2
+            and len(tokens) - kept < self.tail_max_messages // 2
+        ):
+            kept -= 1
+            keep_tokens += tokens[kept]
+        return kept
+
+    async def update_summary(self, conversation_id: int) -> bool:
+        """Fold the messages that no longer fit in the tail into the summary.
+
+        Returns whether the summary changed.
+        """
+        counter = get_token_counter(self.summary_model.value)
+        async with AsyncSessionLocal() as session:
+            conversation = await session.get(Conversation, conversation_id)
+            if conversation is None:
+                return False
+            summary = conversation.summary
+            summarized_until_id = conversation.summarized_until_id
+            messages = await AsyncMessageCRUD(session).get_after(
+                conversation_id, summarized_until_id, limit=self.tail_max_messages * 5
+            )
+            # Release the connection while the model writes the summary
+            await session.commit()
+
+        tokens = [counter.count(message.content) for message in messages]
+        folded = messages[: self.fold_count(tokens)]
+        if not folded:
+            return False
+
+        new_summary = await self.summarize(summary, folded)
+        async with AsyncSessionLocal() as session:
+            # Compare-and-set: another worker may have folded the same messages
+            result = await session.execute(
+                update(Conversation)
+                .where(
+                    Conversation.id == conversation_id,
+                    Conversation.summarized_until_id == summarized_until_id,
+                )
+                .values(summary=new_summary, summarized_until_id=folded[-1].id)
+            )
+            await session.commit()
+        return result.rowcount == 1
+
+    async def summarize(
+        self, summary: Optional[str], messages: Sequence[Message]
+    ) -> str:
+        counter = get_token_counter(self.summary_model.value)
+        transcript = "\n\n".join(
+            "{}: {}".format(
+                "Usuario" if message.role == Role.USER else "Asistente",
+                counter.truncate(message.content, self.tail_tokens),
+            )
+            for message in messages
+        )
+        messages = [
+            SystemMessage(
+                content=SUMMARY_PROMPT.format(
+                    max_words=int(self.summary_max_tokens * 0.75)
+                )
+            ),
+            HumanMessage(
+                content=f"Resumen actual:\n{summary or '(vacío)'}\n\n"
+                f"Nuevos mensajes:\n{transcript}"
+            ),
+        ]
+        await rate_limiter.aacquire(
+            self.summary_provider.value,
+            estimate_chat_tokens(messages, self.summary_model.value),
+            BACKGROUND,
+        )
+        llm = self.llm_registry.get(
+            self.summary_provider, self.summary_model, temperature=0.0
+        )
+        response = await llm.ainvoke(messages)
+        # Hard cap, the prompt limit is only a request
+        return counter.truncate(response.content.strip(), self.summary_max_tokens)
+
+    async def aclose(self) -> None:
+        """Let pending summary updates finish."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+memory_service = MemoryService(
+    llm_registry=llm_registry,
+    summary_model=settings.MEMORY_SUMMARY_MODEL,
+    tail_tokens=settings.MEMORY_TAIL_TOKEN_BUDGET,
+    tail_max_messages=settings.MEMORY_TAIL_MAX_MESSAGES,
+    summary_max_tokens=settings.MEMORY_SUMMARY_MAX_TOKENS,
+)
@@ -0,0 +1,285 @@
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from langchain_core.documents import Document as Chunk
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from src.core.embedding_cache import QueryEmbeddingCache
+from src.core.llm_clients import LLMClientRegistry, parse_model_name
+from src.core.rate_limiter import INTERACTIVE, estimate_chat_tokens, rate_limiter
+from src.models.document_model import Document
+from src.services.memory_service import ConversationHistory
+from src.services.vectorization_service import VectorizationService
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+ScoredChunks = List[Tuple[Chunk, float]]
+
+PLAN_PROMPT = """Descompón la pregunta del usuario en consultas de búsqueda para recuperar fragmentos de un documento.
+
+- Escribe como máximo {max_queries} consultas, una por línea, sin numeración ni comentarios.
+- Cada consulta debe cubrir una parte distinta de la pregunta y entenderse por sí sola.
+- Si se incluye la conversación previa, úsala solo para resolver a qué se refiere la pregunta.
+- Si la pregunta es simple y no necesita descomponerse, responde solo: NINGUNA
+"""
+
+REFINE_PROMPT = """Decide si los fragmentos recuperados bastan para responder la pregunta del usuario.
+
+- Si bastan, responde solo: SUFICIENTE
+- Si falta información, escribe como máximo {max_queries} nuevas consultas de búsqueda para encontrarla, una por línea, sin numeración ni comentarios.
+"""
+
+NO_QUERIES = ("ninguna", "suficiente")
+LIST_MARKER = re.compile(r"^\s*(?:[-*•]|\d+[.)]|[a-z]\))\s*")
+
+
+@dataclass
+class RetrievalResult:
+    vector: List[float]
+    scored_docs: ScoredChunks
+    sub_queries: List[str] = field(default_factory=list)
+    # Milliseconds per step, steps started together overlap
+    timings: Dict[str, float] = field(default_factory=dict)
+    # The first pass was enough (``is_answered`` returned True)
+    stopped: bool = False
+    # Planning missed its deadline and the answer used the first pass only
+    plan_timed_out: bool = False
+
+
+def parse_queries(text: str, max_queries: int, exclude: List[str]) -> List[str]:
+    """Read one query per line, dropping numbering and repeated queries."""
+    seen = {QueryEmbeddingCache.normalize(query) for query in exclude}
+    queries = []
+    for line in text.splitlines():
+        query = LIST_MARKER.sub("", line).strip().strip("\"'")
+        normalized = QueryEmbeddingCache.normalize(query)
+        if normalized.startswith(NO_QUERIES):
+            return []
+        if query and normalized not in seen:
+            seen.add(normalized)
+            queries.append(query)
+    return queries[:max_queries]
+
+
+def plan_input(question: str, history: Optional[ConversationHistory]) -> str:
+    """The question, preceded by the summary and the previous user turn."""
+    parts = []
+    if history is not None:
+        if history.summary:
+            parts.append(f"Resumen de la conversación:\n{history.summary}")
+        last_turn = next(
+            (
+                message.content
+                for message in reversed(history.messages)
+                if isinstance(message, HumanMessage)
+            ),
+            None,
+        )
+        if last_turn:
+            parts.append(f"Pregunta anterior del usuario:\n{last_turn}")
+    if not parts:
+        return question
+    return "\n\n".join([*parts, f"Pregunta:\n{question}"])
+
+
+def merge_hits(*hit_lists: ScoredChunks) -> ScoredChunks:
+    """Union of several searches, each chunk once with its best score."""
+    best: Dict[str, Tuple[Chunk, float]] = {}
+    for hits in hit_lists:
+        for chunk, score in hits:
+            key = chunk.id or chunk.page_content
+            if key not in best or score > best[key][1]:
+                best[key] = (chunk, score)
+    return sorted(best.values(), key=lambda hit: hit[1], reverse=True)
+
+
+class MultiStepRetriever:
+    """Plan, retrieve in parallel, merge, and optionally refine.
+
+    Planning runs on a small model while the question itself is embedded and
+    searched, so the sub-queries only add one batched embedding request and a
+    parallel round of searches to the latency of a single-step retrieval.
+    A plan still running after ``plan_wait_factor`` times the first pass (at
+    least ``plan_min_wait_ms``) is dropped and the first-pass hits are used.
+    """
+
+    def __init__(
+        self,
+        vectorization_service: VectorizationService,
+        llm_registry: LLMClientRegistry,
+        planner_model: str,
+        plan_min_words: int,
+        max_sub_queries: int,
+        sub_query_k: int,
+        refine_max_steps: int,
+        refine_skip_score: float,
+        plan_wait_factor: float,
+        plan_min_wait_ms: float,
+    ) -> None:
+        self.vectorization_service = vectorization_service
+        self.llm_registry = llm_registry
+        self.planner_provider, self.planner_model = parse_model_name(planner_model)
+        self.plan_min_words = plan_min_words
+        self.max_sub_queries = max_sub_queries
+        self.sub_query_k = sub_query_k
+        self.refine_max_steps = refine_max_steps
+        self.refine_skip_score = refine_skip_score
+        self.plan_wait_factor = plan_wait_factor
+        self.plan_min_wait_ms = plan_min_wait_ms
+
+    async def retrieve(
+        self,
+        question: str,
+        document: Document,
+        k: int = 10,
+        is_answered: Optional[Callable[[List[float], ScoredChunks], bool]] = None,
+        history: Optional[ConversationHistory] = None,
+    ) -> RetrievalResult:
+        timings: Dict[str, float] = {}
+        plan = None
+        if self.max_sub_queries > 0 and len(question.split()) >= self.plan_min_words:
+            plan = asyncio.create_task(
+                self._timed(timings, "plan", self.plan(question, history))
+            )
+        started = time.perf_counter()
+        try:
+            vector = await self._timed(
+                timings, "embed", self.vectorization_service.aembed_query(question)
+            )
+            scored_docs = await self._timed(
+                timings,
+                "retrieve",
+                self.vectorization_service.asearch_by_vector_with_relevance(
+                    vector, document=document, k=k
+                ),
+            )
+            result = RetrievalResult(vector, scored_docs, timings=timings)
+            if is_answered is not None and is_answered(vector, scored_docs):
+                result.stopped = True
+                return result
+
+            if plan is not None:
+                first_pass = time.perf_counter() - started
+                wait = max(
+                    first_pass * self.plan_wait_factor, self.plan_min_wait_ms / 1000
+                )
+                try:
+                    # Sub-queries only add recall, not worth holding up the answer
+                    sub_queries = await asyncio.wait_for(plan, wait)
+                except asyncio.TimeoutError:
+                    logger.info(
+                        "Query planning took over %.0f ms, skipped", wait * 1000
+                    )
+                    result.plan_timed_out = True
+                    sub_queries = []
+                if sub_queries:
+                    result.sub_queries += sub_queries
+                    result.scored_docs = merge_hits(
+                        result.scored_docs,
+                        await self._search_many(sub_queries, document, timings, "sub"),
+                    )
+
+            for step in range(1, self.refine_max_steps + 1):
+                best = max((score for _, score in result.scored_docs), default=0.0)
+                if best >= self.refine_skip_score:
+                    break
+                queries = await self._timed(
+                    timings, f"refine{step}", self.refine(question, result)
+                )
+                if not queries:
+                    break
+                result.sub_queries += queries
+                result.scored_docs = merge_hits(
+                    result.scored_docs,
+                    await self._search_many(
+                        queries, document, timings, f"refine{step}"
+                    ),
+                )
+        finally:
+            if plan is not None and not plan.done():
+                plan.cancel()
+
+        logger.info(
+            "Retrieved %d chunks for document %s with %d sub-queries (%s)",
+            len(result.scored_docs),
+            document.id,
+            len(result.sub_queries),
+            ", ".join(f"{name}={ms:.0f}ms" for name, ms in timings.items()),
+        )
+        return result
+
+    async def plan(
+        self, question: str, history: Optional[ConversationHistory] = None
+    ) -> List[str]:
+        prompt = PLAN_PROMPT.format(max_queries=self.max_sub_queries)
+        return await self._ask_queries(
+            prompt, plan_input(question, history), exclude=[question]
+        )
+
+    async def refine(self, question: str, result: RetrievalResult) -> List[str]:
+        passages = "\n\n".join(
+            chunk.page_content[:800] for chunk, _ in result.scored_docs[:8]
+        )
+        return await self._ask_queries(
+            REFINE_PROMPT.format(max_queries=self.max_sub_queries),
+            f"Pregunta: {question}\n\nFragmentos recuperados:\n{passages}",
+            exclude=[question, *result.sub_queries],
+        )
+
+    async def _ask_queries(
+        self, prompt: str, content: str, exclude: List[str]
+    ) -> List[str]:
+        # Planning only improves recall: when it fails, answer from what we have
+        messages = [SystemMessage(content=prompt), HumanMessage(content=content)]
+        try:
+            await rate_limiter.aacquire(
+                self.planner_provider.value,
+                estimate_chat_tokens(messages, self.planner_model.value),
+                INTERACTIVE,
+            )
+            llm = self.llm_registry.get(
+                self.planner_provider, self.planner_model, temperature=0.0
+            )
+            response = await llm.ainvoke(messages)
+        except Exception as exc:
+            logger.warning("Query planning failed: %s", exc)
+            return []
+        return parse_queries(response.content, self.max_sub_queries, exclude)
+
+    async def _search_many(
+        self,
+        queries: List[str],
+        document: Document,
+        timings: Dict[str, float],
+        step: str,
+    ) -> ScoredChunks:
+        # One embedding request for all queries, then the searches in parallel
+        vectors = await self._timed(
+            timings, f"{step}_embed", self.vectorization_service.aembed_queries(queries)
+        )
+        results = await self._timed(
+            timings,
+            f"{step}_retrieve",
+            asyncio.gather(
+                *[
+                    self.vectorization_service.asearch_by_vector_with_relevance(
+                        vector, document=document, k=self.sub_query_k
+                    )
+                    for vector in vectors
+                ]
+            ),
+        )
+        return [hit for hits in results for hit in hits]
+
+    @staticmethod
+    async def _timed(timings: Dict[str, float], name: str, step: Awaitable[T]) -> T:
+        started = time.perf_counter()
+        try:
+            return await step
+        finally:
+            timings[name] = (time.perf_counter() - started) * 1000
@@ -1,52 +1,82 @@
-from typing import List, Union
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional, Tuple
 
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import SystemMessage, HumanMessage
+from fastapi import HTTPException, status
+from langchain_core.documents import Document as Chunk
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
 
+from src.core.answer_cache import AnswerCache
+from src.core.embedding_cache import QueryEmbeddingCache
+from src.core.llm_router import GenerationRouter, ProviderUnavailableError
+from src.core.singleflight import SingleFlight
 from src.schemas.chat_schemas import LLMProvider, LLMModel
 from src.models.document_model import Document
+from src.services.memory_service import ConversationHistory
+from src.services.multistep_service import MultiStepRetriever
 from src.services.vectorization_service import VectorizationService
 from src.core.config import settings
+from src.utils.context_utils import pack_context
+from src.utils.token_utils import get_token_counter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PreparedQuery:
+    document_id: int
+    cache_model: str
+    history: str
+    vector: List[float]
+    chunk_ids: List[str]
+    messages: List[BaseMessage] = field(default_factory=list)
+    cached_answer: Optional[str] = None
 
 
 class RagService:
-    def __init__(self, vectorization_service: VectorizationService) -> None:
+    def __init__(
+        self,
+        vectorization_service: VectorizationService,
+        generation_router: GenerationRouter,
+        retriever: MultiStepRetriever,
+        answer_cache: Optional[AnswerCache] = None,
+        singleflight: Optional[SingleFlight] = None,
+    ) -> None:
         self.vectorization_service = vectorization_service
+        self.generation_router = generation_router
+        self.retriever = retriever
+        self.answer_cache = answer_cache
+        self.singleflight = singleflight
 
-    def get_openai_llm(self, model: LLMModel) -> ChatOpenAI:
-        return ChatOpenAI(
-            api_key=settings.OPENAI_API_KEY, model=model.value, temperature=0.3
-        )
-
-    def get_gemini_llm(self, model: LLMModel) -> ChatGoogleGenerativeAI:
-        return ChatGoogleGenerativeAI(
-            google_api_key=settings.GOOGLE_API_KEY, model=model.value, temperature=0.3
+    async def load_docs(self, message: str, document: Document, k: int = 5):
+        return await self.vectorization_service.asearch_similar_documents(
+            query=message, document=document, k=k
         )
 
-    def get_llm_model(
-        self, provider: LLMProvider, model: LLMModel
-    ) -> Union[ChatOpenAI, ChatGoogleGenerativeAI]:
-        if provider == LLMProvider.OPENAI:
-            return self.get_openai_llm(model)
-        elif provider == LLMProvider.GEMINI:
-            return self.get_gemini_llm(model)
-        else:
-            raise ValueError(f"Not supported provider: '{provider}' with model '{model}'")
-
-    def load_docs(self, message: str, document_id: int, k: int = 5):
-        return self.vectorization_service.search_similar_documents(
-            query=message, document_id=document_id, k=k
+    def build_context(
+        self, scored_docs: List[Tuple[Chunk, float]], model: LLMModel
+    ) -> str:
+        segments = pack_context(
+            scored_docs,
+            token_counter=get_token_counter(model.value),
+            max_tokens=settings.CONTEXT_TOKEN_BUDGETS.get(
+                model.value, settings.CONTEXT_TOKEN_BUDGET
+            ),
+            min_score=settings.CONTEXT_MIN_RELEVANCE,
         )
+        return "\n\n".join(segment.text for segment in segments)
 
-    def rag_query(
+    async def prepare_query(
         self,
         message: str,
-        history: List[str],
+        history: ConversationHistory,
         document: Document,
         provider: LLMProvider,
         model: LLMModel,
-    ):
+    ) -> PreparedQuery:
+        """Retrieve context and build the prompt, or find a cached answer."""
         system_prompt = """Actúa como un asistente amigable. Tu objetivo principal es ayudar a los usuarios a encontrar respuestas dentro de sus documentos.
 
         Sigue estas reglas estrictamente:
@@ -62,21 +92,175 @@ class RagService:
         Contexto relevante del documento:
         {context}
         """
+        summary_prompt = """
+        Resumen de la conversación anterior:
+        {summary}
+        """
+
+        query = PreparedQuery(
+            document_id=document.id,
+            cache_model=f"{provider.value}:{model.value}",
+            history=self.history_digest(history),
+            vector=[],
+            chunk_ids=[],
+        )
+
+        def find_cached_answer(vector: List[float], scored_docs) -> bool:
+            # Keyed by the first pass over the question itself, the only part
+            # of the retrieval that is deterministic
+            query.vector = vector
+            query.chunk_ids = [doc.id for doc, _ in scored_docs]
+            if self.answer_cache:
+                query.cached_answer = self.answer_cache.get(
+                    query.document_id,
+                    query.cache_model,
+                    query.history,
+                    vector,
+                    query.chunk_ids,
+                )
+            return query.cached_answer is not None
 
-        llm = self.get_llm_model(provider, model)
+        retrieval = await self.retriever.retrieve(
+            message, document, k=10, is_answered=find_cached_answer, history=history
+        )
+        if retrieval.stopped:
+            return query
 
-        docs = self.load_docs(message=message, document_id=document.id, k=10)
-        context = "\n".join([doc.page_content for doc in docs])
+        context = self.build_context(retrieval.scored_docs, model)
 
         metadata = f"Filename: {document.filename}"
 
         system_prompt_fmt = system_prompt.format(context=context, metadata=metadata)
+        if history.summary:
+            system_prompt_fmt += summary_prompt.format(summary=history.summary)
 
-        messages = [
+        query.messages = [
             SystemMessage(content=system_prompt_fmt),
-            *[HumanMessage(content=msg) for msg in history],
-            HumanMessage(content="message"),
+            *history.messages,
+            HumanMessage(content=message),
         ]
+        return query
+
+    def remember_answer(self, query: PreparedQuery, answer: str) -> None:
+        if self.answer_cache:
+            self.answer_cache.put(
+                query.document_id,
+                query.cache_model,
+                query.history,
+                query.vector,
+                query.chunk_ids,
+                answer,
+            )
+
+    @staticmethod
+    def history_digest(history: ConversationHistory) -> str:
+        digest = hashlib.sha256((history.summary or "").encode())
+        for msg in history.messages:
+            digest.update(f"\0{msg.type}:{msg.content}".encode())
+        return digest.hexdigest()
+
+    @classmethod
+    def flight_key(
+        cls,
+        message: str,
+        history: ConversationHistory,
+        document: Document,
+        provider: LLMProvider,
+        model: LLMModel,
+    ) -> Tuple[int, str, str, str]:
+        """Requests with equal keys get the same answer and can share one run."""
+        return (
+            document.id,
+            QueryEmbeddingCache.normalize(message),
+            cls.history_digest(history),
+            f"{provider.value}:{model.value}",
+        )
+
+    async def rag_query(
+        self,
+        message: str,
+        history: ConversationHistory,
+        document: Document,
+        provider: LLMProvider,
+        model: LLMModel,
+    ) -> str:
+        args = (message, history, document, provider, model)
+        if self.singleflight is None:
+            return "".join([part async for part in self._answer(*args)])
+        return await self.singleflight.do(
+            self.flight_key(*args), lambda: self._answer(*args)
+        )
+
+    async def _answer(
+        self,
+        message: str,
+        history: ConversationHistory,
+        document: Document,
+        provider: LLMProvider,
+        model: LLMModel,
+    ) -> AsyncIterator[str]:
+        query = await self.prepare_query(message, history, document, provider, model)
+        if query.cached_answer is not None:
+            yield query.cached_answer
+            return
+
+        try:
+            answer = await self.generation_router.ainvoke(
+                provider, model, query.messages
+            )
+        except ProviderUnavailableError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)
+            )
+        self.remember_answer(query, answer)
+        yield answer
+
+    async def astream_query(
+        self,
+        message: str,
+        history: ConversationHistory,
+        document: Document,
+        provider: LLMProvider,
+        model: LLMModel,
+    ) -> AsyncIterator[str]:
+        """Yield the answer as the model generates it."""
+        started = time.perf_counter()
+        args = (message, history, document, provider, model)
+        if self.singleflight is None:
+            parts = self._stream_answer(*args)
+        else:
+            parts = self.singleflight.stream(
+                self.flight_key(*args), lambda: self._stream_answer(*args)
+            )
+        first = True
+        async for token in parts:
+            if first:
+                logger.info(
+                    "First token for %s after %.0f ms",
+                    model.value,
+                    (time.perf_counter() - started) * 1000,
+                )
+                first = False
+            yield token
+
+    async def _stream_answer(
+        self,
+        message: str,
+        history: ConversationHistory,
+        document: Document,
+        provider: LLMProvider,
+        model: LLMModel,
+    ) -> AsyncIterator[str]:
+        query = await self.prepare_query(message, history, document, provider, model)
+        if query.cached_answer is not None:
+            yield query.cached_answer
+            return
 
-        response = llm.invoke(messages)
-        return response.content
+        parts = []
+        async for token in self.generation_router.astream(
+            provider, model, query.messages
+        ):
+            parts.append(token)
+            yield token
+        # Only complete answers are cached
+        self.remember_answer(query, "".join(parts))
@@ -1,41 +1,151 @@
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 
 from langchain_chroma import Chroma
+from langchain_core.documents import Document as Chunk
+from langchain_core.runnables.config import run_in_executor
+from langchain_core.vectorstores import VectorStore
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from src.utils.doc_utils import load_document
+from src.core.embedding_batcher import EmbeddingBatcher
+from src.core.embedding_cache import CachedEmbeddings
+from src.core.numpy_store import NumpyVectorStore
+from src.core.vector_keys import chunk_id, shard_key
+from src.models.document_model import Document
+from src.utils.doc_utils import lazy_load_document
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
 
 
 class VectorizationService:
     """Servicio que coordina el procesamiento y almacenamiento vectorial"""
 
-    def __init__(self, vector_store: Chroma):
+    def __init__(
+        self, vector_store: VectorStore, embedding_batcher: EmbeddingBatcher
+    ):
         self.vector_store = vector_store
+        self.embedding_batcher = embedding_batcher
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000, chunk_overlap=200, separators=["\n\n", "\n", " ", ""]
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            separators=["\n\n", "\n", " ", ""],
+            # Lets the prompt builder drop the exact overlap between chunks
+            add_start_index=True,
         )
 
+    def iter_chunks(
+        self, file_path: str, metadata: Dict[str, Any]
+    ) -> Iterator[Chunk]:
+        """Split the document page by page as it is being parsed."""
+        vector_key = shard_key(metadata)
+        idx = 0
+        for page_idx, page in enumerate(lazy_load_document(file_path)):
+            for chunk in self.text_splitter.split_documents([page]):
+                idx += 1
+                chunk.metadata = {
+                    **metadata,
+                    "chunk_idx": idx,
+                    # Chunks only overlap within a page
+                    "page": page_idx,
+                    "start_index": chunk.metadata["start_index"],
+                }
+                # Deterministic ids make retries upsert instead of duplicating
+                chunk.id = chunk_id(vector_key, idx)
+                yield chunk
+
     def process_and_store_document(
         self, file_path: str, metadata: Dict[str, Any]
     ) -> None:
-        documents = load_document(file_path)
-        chunks = self.text_splitter.split_documents(documents)
-        for idx, chunk in enumerate(chunks, start=1):
-            chunk.metadata = metadata
-            chunk.metadata["chunk_idx"] = idx
-        
-        # Embed documents in chunks because OpenAI limitation
-        step = 300_000 // 1_000
-        i = 0
-        while i < len(chunks):
-            self.vector_store.add_documents(chunks[i : min(i + step, len(chunks))])
-            i += step
+        # Only the batches in flight are held in memory, never the whole document
+        self.embedding_batcher.run(
+            self.iter_chunks(file_path, metadata), self.vector_store.add_documents
+        )
+        if isinstance(self.vector_store, NumpyVectorStore):
+            # Merge the parts written by concurrent batches into one matrix
+            self.vector_store.compact([shard_key(metadata)])
+
+    @staticmethod
+    def vector_filter(document: Document) -> Dict[str, Any]:
+        # Documents with the same content share one set of chunk vectors
+        if document.content_hash:
+            return {"content_hash": document.content_hash}
+        return {"document_id": document.id}
 
     def search_similar_documents(
-        self, query: str, document_id: Optional[int], k: int = 5
+        self, query: str, document: Optional[Document], k: int = 5
     ):
-        filter = {"document_id": document_id} if document_id else None
+        filter = self.vector_filter(document) if document else None
         return self.vector_store.similarity_search(query, k=k, filter=filter)
 
-    def delete_document_vectors(self, document_id: int) -> None:
-        self.vector_store.delete([f"doc_{document_id}"])
+    async def asearch_similar_documents(
+        self, query: str, document: Optional[Document], k: int = 5
+    ) -> List[Chunk]:
+        filter = self.vector_filter(document) if document else None
+        return await self.vector_store.asimilarity_search(query, k=k, filter=filter)
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.vector_store.embeddings.embed_query(query)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        return await self.vector_store.embeddings.aembed_query(query)
+
+    async def aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        embeddings = self.vector_store.embeddings
+        if isinstance(embeddings, CachedEmbeddings):
+            return await embeddings.aembed_queries(queries)
+        return await embeddings.aembed_documents(queries)
+
+    def search_by_vector(
+        self, vector: List[float], document: Optional[Document], k: int = 5
+    ) -> List[Chunk]:
+        filter = self.vector_filter(document) if document else None
+        return self.vector_store.similarity_search_by_vector(vector, k=k, filter=filter)
+
+    def search_by_vector_with_relevance(
+        self, vector: List[float], document: Optional[Document], k: int = 5
+    ) -> List[Tuple[Chunk, float]]:
+        """Search returning relevance scores in [0, 1], higher is closer."""
+        filter = self.vector_filter(document) if document else None
+        if isinstance(self.vector_store, Chroma):
+            # Despite its name this returns raw distances
+            search = self.vector_store.similarity_search_by_vector_with_relevance_scores
+        else:
+            search = self.vector_store.similarity_search_by_vector_with_score
+        results = search(vector, k=k, filter=filter)
+        relevance = self.vector_store._select_relevance_score_fn()
+        return [(chunk, relevance(score)) for chunk, score in results]
+
+    async def asearch_by_vector_with_relevance(
+        self, vector: List[float], document: Optional[Document], k: int = 5
+    ) -> List[Tuple[Chunk, float]]:
+        # Neither Chroma nor the numpy store has native async search; like
+        # VectorStore.asimilarity_search, run it on the default executor
+        return await run_in_executor(
+            None, self.search_by_vector_with_relevance, vector, document, k
+        )
+
+    def delete_document_vectors(self, document: Document) -> None:
+        self.vector_store.delete(where=self.vector_filter(document))
+
+    def delete_chunks(self, ids: List[str], batch_size: int = 5_000) -> None:
+        for start in range(0, len(ids), batch_size):
+            self.vector_store.delete(ids[start : start + batch_size])
+
+    def find_orphan_chunks(
+        self, is_live: Callable[[Dict[str, Any]], bool], batch_size: int = 5_000
+    ) -> List[str]:
+        """Return ids of stored chunks whose metadata ``is_live`` rejects."""
+        orphans = []
+        offset = 0
+        while True:
+            page = self.vector_store.get(
+                include=["metadatas"], limit=batch_size, offset=offset
+            )
+            if not page["ids"]:
+                return orphans
+            orphans.extend(
+                id
+                for id, metadata in zip(page["ids"], page["metadatas"])
+                if not is_live(metadata or {})
+            )
+            offset += len(page["ids"])
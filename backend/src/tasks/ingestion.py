@@ -0,0 +1,126 @@
+import logging
+import time
+
+from src.core.answer_cache import answer_cache
+from src.core.config import settings
+from src.core.db import SessionLocal
+from src.core.queue import celery_app, local_broker
+from src.core.store import embedding_batcher, vector_store
+from src.crud.document_crud import DocumentCRUD
+from src.models.document_model import DocumentStatus
+from src.schemas.document_schemas import DocumentUpdate
+from src.services.vectorization_service import VectorizationService
+
+logger = logging.getLogger(__name__)
+
+
+def _set_status(crud: DocumentCRUD, document, status: DocumentStatus) -> None:
+    crud.update(document, DocumentUpdate(status=status))
+
+
+def ingest_document(document_id: int) -> None:
+    """Parse, chunk and embed a stored document, driving its status."""
+    vectorization_service = VectorizationService(
+        vector_store=vector_store, embedding_batcher=embedding_batcher
+    )
+    with SessionLocal() as session:
+        crud = DocumentCRUD(session)
+        document = crud.get_by_id(document_id)
+        if document is None:
+            logger.warning("Document %s no longer exists, skipping", document_id)
+            return
+
+        if document.content_hash and crud.get_indexed_by_content_hash(
+            document.content_hash
+        ):
+            # Identical content is already embedded, reuse its vectors
+            _set_status(crud, document, DocumentStatus.COMPLETED)
+            return
+
+        # Only a retry can have left chunks of its own behind
+        retrying = document.status in (
+            DocumentStatus.PROCESSING,
+            DocumentStatus.FAILED,
+        )
+        _set_status(crud, document, DocumentStatus.PROCESSING)
+        # Checked after taking PROCESSING: of two uploads of the same content
+        # racing here, at least the later one sees the other
+        shared = document.content_hash and crud.get_active_by_content_hash(
+            document.content_hash, exclude_id=document.id
+        )
+        if shared and shared.status == DocumentStatus.COMPLETED:
+            _set_status(crud, document, DocumentStatus.COMPLETED)
+            return
+        if retrying and not shared:
+            # Drop whatever a previous failed attempt managed to store. Chunks
+            # are keyed by content hash, so this would also delete the vectors
+            # of another document with the same content: when there is one,
+            # rely on chunk ids being deterministic and upsert over them
+            vectorization_service.delete_document_vectors(document)
+        metadata = {
+            "document_id": document.id,
+            "owner_id": document.owner_id,
+            "filename": document.filename,
+        }
+        if document.content_hash:
+            metadata["content_hash"] = document.content_hash
+        vectorization_service.process_and_store_document(
+            file_path=document.storage_path, metadata=metadata
+        )
+        if answer_cache:
+            # Only reaches the API's cache with the local broker, other
+            # processes rely on the chunk ids check and the TTL
+            answer_cache.invalidate(document.id)
+        _set_status(crud, document, DocumentStatus.COMPLETED)
+
+
+def mark_document_failed(document_id: int) -> None:
+    with SessionLocal() as session:
+        crud = DocumentCRUD(session)
+        document = crud.get_by_id(document_id)
+        if document is not None:
+            _set_status(crud, document, DocumentStatus.FAILED)
+
+
+def _retry_delay(attempt: int) -> int:
+    return settings.INGESTION_RETRY_BACKOFF_SECONDS * 2**attempt
+
+
+@celery_app.task(bind=True, name="ingestion.ingest_document")
+def ingest_document_task(self, document_id: int) -> None:
+    try:
+        ingest_document(document_id)
+    except Exception as exc:
+        if self.request.retries >= settings.INGESTION_MAX_RETRIES:
+            logger.exception("Ingestion of document %s failed", document_id)
+            mark_document_failed(document_id)
+            raise
+        raise self.retry(
+            exc=exc,
+            countdown=_retry_delay(self.request.retries),
+            max_retries=settings.INGESTION_MAX_RETRIES,
+        )
+
+
+def _ingest_locally(document_id: int) -> None:
+    for attempt in range(settings.INGESTION_MAX_RETRIES + 1):
+        try:
+            ingest_document(document_id)
+            return
+        except Exception:
+            if attempt == settings.INGESTION_MAX_RETRIES:
+                logger.exception("Ingestion of document %s failed", document_id)
+                mark_document_failed(document_id)
+                return
+            time.sleep(_retry_delay(attempt))
+
+
+def enqueue_document_ingestion(document_id: int) -> None:
+    if settings.INGESTION_BROKER == "celery":
+        ingest_document_task.delay(document_id)
+    elif settings.INGESTION_BROKER == "local":
+        local_broker.submit(_ingest_locally, document_id)
+    else:
+        raise ValueError(
+            f"Not supported ingestion broker: '{settings.INGESTION_BROKER}'"
+        )
@@ -0,0 +1,121 @@
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document as Chunk
+
+from src.core.vector_keys import shard_key
+from src.utils.token_utils import TokenCounter
+
+
+@dataclass
+class ContextSegment:
+    """A run of consecutive chunks of one document, with overlaps removed."""
+
+    key: str
+    first_idx: int
+    last_idx: int
+    text: str
+    score: float
+    chunk_ids: List[str] = field(default_factory=list)
+    page: Optional[int] = None
+    # Offset in the page where the text ends, when the chunks recorded one
+    end: Optional[int] = None
+
+
+def _position(chunk: Chunk) -> Tuple[Optional[int], Optional[int]]:
+    return chunk.metadata.get("page"), chunk.metadata.get("start_index")
+
+
+def merge_adjacent(scored_chunks: List[Tuple[Chunk, float]]) -> List[ContextSegment]:
+    """Join chunks with consecutive ``chunk_idx`` on the same page into segments.
+
+    Only chunks that recorded their page and offset are joined: the overlap
+    between them is then known exactly, never guessed from the text. A
+    segment scores as its best chunk. Segments come back in document order.
+    """
+    ordered = sorted(
+        scored_chunks,
+        key=lambda item: (
+            shard_key(item[0].metadata),
+            item[0].metadata.get("chunk_idx", 0),
+        ),
+    )
+    segments: List[ContextSegment] = []
+    for chunk, score in ordered:
+        key = shard_key(chunk.metadata)
+        idx = chunk.metadata.get("chunk_idx", 0)
+        page, start = _position(chunk)
+        last = segments[-1] if segments else None
+        if last and chunk.id is not None and chunk.id in last.chunk_ids:
+            # The same chunk returned twice
+            last.score = max(last.score, score)
+        elif (
+            last
+            and last.key == key
+            and idx == last.last_idx + 1
+            and start is not None
+            and last.end is not None
+            and page == last.page
+        ):
+            overlap = last.end - start
+            if overlap >= 0:
+                last.text += chunk.page_content[overlap:]
+            else:
+                # The splitter dropped the whitespace between them
+                last.text += "\n" + chunk.page_content
+            last.last_idx = idx
+            last.end = max(last.end, start + len(chunk.page_content))
+            last.score = max(last.score, score)
+            last.chunk_ids.append(chunk.id)
+        else:
+            segments.append(
+                ContextSegment(
+                    key=key,
+                    first_idx=idx,
+                    last_idx=idx,
+                    text=chunk.page_content,
+                    score=score,
+                    chunk_ids=[chunk.id],
+                    page=page,
+                    end=None if start is None else start + len(chunk.page_content),
+                )
+            )
+    return segments
+
+
+def pack_context(
+    scored_chunks: List[Tuple[Chunk, float]],
+    token_counter: TokenCounter,
+    max_tokens: int,
+    min_score: float,
+) -> List[ContextSegment]:
+    """Select the most relevant segments that fit in ``max_tokens``.
+
+    Chunks scoring below ``min_score`` are dropped, except the best one so a
+    question never runs without context. Segments are added by score and a
+    segment that does not fit is truncated only if nothing was packed yet.
+    """
+    if not scored_chunks:
+        return []
+    best = max(score for _, score in scored_chunks)
+    kept = [
+        (chunk, score)
+        for chunk, score in scored_chunks
+        if score >= min_score or score == best
+    ]
+
+    packed: List[ContextSegment] = []
+    used = 0
+    segments = merge_adjacent(kept)
+    for segment in sorted(segments, key=lambda segment: segment.score, reverse=True):
+        tokens = token_counter.count(segment.text)
+        if used + tokens > max_tokens:
+            if packed:
+                continue
+            segment.text = token_counter.truncate(segment.text, max_tokens)
+            tokens = max_tokens
+        packed.append(segment)
+        used += tokens
+    # Back to document order, reads better than relevance order
+    packed_ids = {id(segment) for segment in packed}
+    return [segment for segment in segments if id(segment) in packed_ids]
@@ -1,6 +1,13 @@
-from typing import List
+import math
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
 
+import pypdf
 from langchain_core.documents import Document
+from langchain_core.document_loaders import BaseLoader
 from langchain_community.document_loaders import (
     PyPDFLoader,
     Docx2txtLoader,
@@ -8,17 +15,101 @@ from langchain_community.document_loaders import (
     UnstructuredMarkdownLoader,
 )
 
+from src.core.config import settings
 
-def load_document(file_path: str) -> List[Document]:
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def get_loader(file_path: str) -> BaseLoader:
     if file_path.endswith(".pdf"):
-        loader = PyPDFLoader(file_path)
+        return PyPDFLoader(file_path)
     elif file_path.endswith(".docx"):
-        loader = Docx2txtLoader(file_path)
+        return Docx2txtLoader(file_path)
     elif file_path.endswith(".txt"):
-        loader = TextLoader(file_path, autodetect_encoding=True)
+        return TextLoader(file_path, autodetect_encoding=True)
     elif file_path.endswith(".md"):
-        loader = UnstructuredMarkdownLoader(file_path)
+        return UnstructuredMarkdownLoader(file_path)
     else:
         raise ValueError("Unsupported file format")
 
-    return loader.load()
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=settings.PDF_PARSE_WORKERS)
+        return _pdf_pool
+
+
+def _parse_pdf_pages(file_path: str, start: int, end: int) -> List[Document]:
+    """Extract pages ``[start, end)`` with the same metadata PyPDFLoader emits."""
+    reader = pypdf.PdfReader(file_path)
+    doc_metadata = {
+        "producer": "PyPDF",
+        "creator": "PyPDF",
+        "creationdate": "",
+        **{
+            key.lstrip("/").lower(): str(value)
+            for key, value in (reader.metadata or {}).items()
+        },
+        "source": file_path,
+        "total_pages": len(reader.pages),
+    }
+    return [
+        Document(
+            page_content=reader.pages[page]
+            .extract_text(extraction_mode="plain")
+            .strip(),
+            metadata={
+                **doc_metadata,
+                "page": page,
+                "page_label": reader.page_labels[page],
+            },
+        )
+        for page in range(start, end)
+    ]
+
+
+def _lazy_load_pdf_parallel(file_path: str, total_pages: int) -> Iterator[Document]:
+    pool = _get_pdf_pool()
+    # Every task reopens the file, so cap the task count at a few per worker
+    step = max(
+        settings.PDF_PAGES_PER_TASK,
+        math.ceil(total_pages / (settings.PDF_PARSE_WORKERS * 4)),
+    )
+    ranges = [
+        (start, min(start + step, total_pages)) for start in range(0, total_pages, step)
+    ]
+    # Keep a bounded window of page ranges in flight, yielded back in page order
+    window: deque = deque()
+    for start, end in ranges:
+        window.append(pool.submit(_parse_pdf_pages, file_path, start, end))
+        if len(window) >= settings.PDF_PARSE_WORKERS * 2:
+            yield from window.popleft().result()
+    while window:
+        yield from window.popleft().result()
+
+
+def _can_parse_in_parallel() -> bool:
+    # Daemonic processes (e.g. Celery prefork children) cannot spawn a pool
+    return (
+        settings.PDF_PARSE_WORKERS > 1 and not multiprocessing.current_process().daemon
+    )
+
+
+def lazy_load_document(file_path: str) -> Iterator[Document]:
+    """Yield the document page by page instead of materializing all of it.
+
+    Large PDFs are split into page ranges parsed across a process pool; DOCX
+    and text formats have no page structure and are always parsed in-process.
+    """
+    if file_path.endswith(".pdf") and _can_parse_in_parallel():
+        total_pages = len(pypdf.PdfReader(file_path).pages)
+        if total_pages >= settings.PDF_PARALLEL_MIN_PAGES:
+            return _lazy_load_pdf_parallel(file_path, total_pages)
+    return get_loader(file_path).lazy_load()
+
+
+def load_document(file_path: str) -> List[Document]:
+    return list(lazy_load_document(file_path))
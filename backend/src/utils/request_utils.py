@@ -0,0 +1,44 @@
+from typing import Awaitable, TypeVar
+
+import anyio
+from fastapi import HTTPException, Request
+
+T = TypeVar("T")
+
+# Non-standard, popularised by nginx for requests the client abandoned
+HTTP_499_CLIENT_CLOSED_REQUEST = 499
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """Await ``awaitable`` unless the client disconnects first.
+
+    On disconnect the work is cancelled, so an abandoned request stops
+    holding its upstream LLM call and database session.
+    """
+    finished = False
+    error = None
+
+    async with anyio.create_task_group() as tg:
+
+        async def watch_disconnect() -> None:
+            # The body was already read, the next message is the disconnect
+            while (await request.receive())["type"] != "http.disconnect":
+                pass
+            tg.cancel_scope.cancel()
+
+        tg.start_soon(watch_disconnect)
+        try:
+            result = await awaitable
+            finished = True
+        except Exception as exc:
+            # Raised outside the task group so it is not wrapped in a group
+            error = exc
+        tg.cancel_scope.cancel()
+
+    if error is not None:
+        raise error
+    if not finished:
+        raise HTTPException(
+            status_code=HTTP_499_CLIENT_CLOSED_REQUEST, detail="Client closed request"
+        )
+    return result
@@ -0,0 +1,17 @@
+import json
+from typing import AsyncIterator, Tuple
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop reverse proxies (nginx) from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def sse_stream(events: AsyncIterator[Tuple[str, dict]]) -> AsyncIterator[str]:
+    async for event, data in events:
+        yield format_sse(event, data)
@@ -0,0 +1,45 @@
+import logging
+from functools import cached_property, lru_cache
+from typing import Optional
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCounter:
+    """tiktoken-based token counting that degrades to an estimate offline."""
+
+    def __init__(self, model: str) -> None:
+        self.model = model
+
+    @cached_property
+    def encoding(self) -> Optional[tiktoken.Encoding]:
+        # Loaded lazily, tiktoken may download the BPE ranks on first use
+        try:
+            try:
+                return tiktoken.encoding_for_model(self.model)
+            except KeyError:
+                # Non-OpenAI models: cl100k_base is a close enough estimate
+                return tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            logger.warning("tiktoken encoding unavailable, estimating token counts")
+            return None
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return len(text) // 4 + 1
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is None:
+            return text[: max_tokens * 4]
+        tokens = self.encoding.encode(text, disallowed_special=())
+        return self.encoding.decode(tokens[:max_tokens])
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(model: str) -> TokenCounter:
+    return TokenCounter(model)
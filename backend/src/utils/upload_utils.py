@@ -0,0 +1,66 @@
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import anyio
+from fastapi import UploadFile
+
+
+class FileTooLargeError(ValueError):
+    pass
+
+
+@dataclass
+class StoredUpload:
+    path: Path
+    size: int
+    sha256: str
+    already_stored: bool = False
+
+
+async def save_upload(
+    file: UploadFile,
+    staging_dir: Path,
+    destination: Callable[[str], Path],
+    max_bytes: int,
+    chunk_size: int,
+) -> StoredUpload:
+    """Stream an upload to disk, hashing and counting bytes in the same pass.
+
+    The data is written to a temporary file in ``staging_dir`` and only
+    renamed to ``destination(sha256)`` once it has been fully received, so
+    readers never see a partial file. If the destination already exists the
+    upload is a duplicate and the temporary file is discarded.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise FileTooLargeError(f"File exceeds {max_bytes} bytes")
+
+    tmp_path = staging_dir / f".{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with await anyio.open_file(tmp_path, "wb") as buffer:
+            while chunk := await file.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise FileTooLargeError(f"File exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                await buffer.write(chunk)
+
+        sha256 = digest.hexdigest()
+        path = destination(sha256)
+        already_stored = await anyio.Path(path).exists()
+        if already_stored:
+            await anyio.Path(tmp_path).unlink()
+        else:
+            await anyio.to_thread.run_sync(os.replace, tmp_path, path)
+    except BaseException:
+        await anyio.Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+    return StoredUpload(
+        path=path, size=size, sha256=sha256, already_stored=already_stored
+    )
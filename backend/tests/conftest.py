@@ -0,0 +1,5 @@
+import os
+
+# Settings are required at import time, nothing here talks to the providers
+for key in ("SECRET_KEY", "OPENAI_API_KEY", "GOOGLE_API_KEY"):
+    os.environ.setdefault(key, "test")
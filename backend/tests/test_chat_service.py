@@ -0,0 +1,63 @@
+import pytest
+
+from src.schemas.chat_schemas import LLMModel, LLMProvider
+from src.services.chat_service import ChatService
+from src.services.memory_service import ConversationHistory
+
+
+class StubRag:
+    def __init__(self, tokens, error=None) -> None:
+        self.tokens = tokens
+        self.error = error
+
+    async def astream_query(self, **kwargs):
+        for token in self.tokens:
+            yield token
+        if self.error:
+            raise self.error
+
+
+class RecordingChatService(ChatService):
+    def __init__(self, rag, save_error=None) -> None:
+        super().__init__(None, None, None, rag, None)
+        self.save_error = save_error
+        self.saved = []
+
+    async def _save_reply(self, conversation_id, content):
+        self.saved.append(content)
+        if self.save_error:
+            raise self.save_error
+
+
+async def stream(service: ChatService):
+    events = service._stream_reply(
+        1,
+        "¿Qué dice?",
+        ConversationHistory(),
+        None,
+        LLMProvider.OPENAI,
+        LLMModel.GPT_4O,
+    )
+    return [event async for event, _ in events]
+
+
+@pytest.mark.asyncio
+async def test_failed_save_is_not_retried():
+    service = RecordingChatService(
+        StubRag(["Hola", " mundo"]), save_error=RuntimeError("db down")
+    )
+
+    events = await stream(service)
+
+    assert events == ["token", "token", "error"]
+    assert service.saved == ["Hola mundo"]
+
+
+@pytest.mark.asyncio
+async def test_partial_reply_is_kept_when_the_model_fails():
+    service = RecordingChatService(StubRag(["Hola"], error=RuntimeError("timeout")))
+
+    events = await stream(service)
+
+    assert events == ["token", "error"]
+    assert service.saved == ["Hola"]
@@ -0,0 +1,82 @@
+from langchain_core.documents import Document as Chunk
+
+from src.utils.context_utils import pack_context
+
+
+class WordCounter:
+    def count(self, text: str) -> int:
+        return len(text.split())
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        return " ".join(text.split()[:max_tokens])
+
+
+def chunk(idx: int, text: str, page=None, start=None, key: str = "h") -> Chunk:
+    metadata = {"content_hash": key, "chunk_idx": idx}
+    if page is not None:
+        metadata["page"] = page
+        metadata["start_index"] = start
+    return Chunk(id=f"{key}:{idx}", page_content=text, metadata=metadata)
+
+
+def pack(scored, max_tokens: int = 1000, min_score: float = 0.0):
+    return pack_context(scored, WordCounter(), max_tokens, min_score)
+
+
+def test_strips_the_recorded_overlap():
+    page = "alpha beta gamma delta epsilon"
+    first = chunk(0, page[:16], page=0, start=0)
+    second = chunk(1, page[11:], page=0, start=11)
+
+    [segment] = pack([(second, 0.5), (first, 0.9)])
+
+    assert segment.text == page
+    assert (segment.first_idx, segment.last_idx, segment.score) == (0, 1, 0.9)
+
+
+def test_keeps_text_that_only_looks_like_an_overlap():
+    first = chunk(0, "Total: 100", page=0, start=0)
+    second = chunk(1, "0 unidades", page=0, start=11)
+
+    [segment] = pack([(first, 0.9), (second, 0.8)])
+
+    assert segment.text == "Total: 100\n0 unidades"
+
+
+def test_does_not_merge_across_pages():
+    first = chunk(0, "end of page one", page=0, start=0)
+    second = chunk(1, "page one", page=1, start=0)
+
+    segments = pack([(first, 0.9), (second, 0.8)])
+
+    assert [segment.text for segment in segments] == ["end of page one", "page one"]
+
+
+def test_chunks_without_offsets_stay_apart():
+    first = chunk(0, "Total: 100")
+    second = chunk(1, "0 unidades")
+
+    segments = pack([(first, 0.9), (second, 0.8)])
+
+    assert [segment.text for segment in segments] == ["Total: 100", "0 unidades"]
+
+
+def test_packs_by_score_within_budget_in_document_order():
+    scored = [
+        (chunk(0, "one two three", key="a"), 0.5),
+        (chunk(0, "four five", key="b"), 0.9),
+        (chunk(0, "six seven eight nine", key="c"), 0.7),
+        (chunk(0, "ten", key="d"), 0.1),
+    ]
+
+    segments = pack(scored, max_tokens=6, min_score=0.3)
+
+    assert [segment.key for segment in segments] == ["b", "c"]
+
+
+def test_truncates_the_best_segment_when_nothing_fits():
+    scored = [(chunk(0, "one two three four", key="a"), 0.1)]
+
+    [segment] = pack(scored, max_tokens=2, min_score=0.5)
+
+    assert segment.text == "one two"
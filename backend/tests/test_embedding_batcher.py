@@ -0,0 +1,35 @@
+import threading
+
+from langchain_core.documents import Document
+
+from src.core.embedding_batcher import EmbeddingBatcher
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def test_counts_every_rate_limited_retry_across_workers():
+    batcher = EmbeddingBatcher(
+        model="text-embedding-3-small",
+        max_tokens_per_batch=1_000,
+        max_items_per_batch=1,
+        concurrency=8,
+        max_retries=3,
+        backoff_seconds=0,
+    )
+    failed = set()
+    lock = threading.Lock()
+
+    def store(batch):
+        # Every batch is rate limited once before it goes through
+        with lock:
+            first_try = batch[0].page_content not in failed
+            failed.add(batch[0].page_content)
+        if first_try:
+            raise RateLimited()
+
+    chunks = [Document(page_content=f"chunk {i}") for i in range(200)]
+    stats = batcher.run(chunks, store)
+
+    assert (stats.chunks, stats.batches, stats.rate_limited) == (200, 200, 200)
@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from src.core.embedding_cache import (
+    CachedEmbeddings,
+    EmbeddingCache,
+    QueryEmbeddingCache,
+)
+from src.core.fake_providers import HashingEmbeddings
+
+
+class RecordingCache(EmbeddingCache):
+    """Shared cache that remembers which threads touched SQLite."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.threads = []
+
+    def get_many(self, keys):
+        self.threads.append(threading.get_ident())
+        return super().get_many(keys)
+
+    def put_many(self, keys, vectors):
+        self.threads.append(threading.get_ident())
+        super().put_many(keys, vectors)
+
+
+def make_embeddings(shared: EmbeddingCache) -> CachedEmbeddings:
+    return CachedEmbeddings(
+        HashingEmbeddings(size=16),
+        model="fake",
+        query_cache=QueryEmbeddingCache(max_entries=100, ttl_seconds=60, shared=shared),
+    )
+
+
+@pytest.mark.asyncio
+async def test_async_queries_reach_sqlite_off_the_event_loop(tmp_path):
+    shared = RecordingCache(tmp_path / "cache.sqlite3", max_entries=100)
+    embeddings = make_embeddings(shared)
+
+    first = await embeddings.aembed_query("¿Qué dice?")
+    await embeddings.aembed_queries(["otra pregunta", "¿qué   dice?"])
+
+    assert len(shared.threads) == 4
+    assert threading.get_ident() not in shared.threads
+    # Served from memory without touching SQLite again
+    assert await embeddings.aembed_query("¿qué dice?") == first
+    assert len(shared.threads) == 4
+
+
+@pytest.mark.asyncio
+async def test_async_queries_reuse_vectors_of_other_workers(tmp_path):
+    shared = EmbeddingCache(tmp_path / "cache.sqlite3", max_entries=100)
+    vector = await make_embeddings(shared).aembed_query("pregunta")
+
+    other = make_embeddings(shared)
+    assert await other.aembed_query("pregunta") == pytest.approx(vector)
+    assert other.query_cache.stats()["shared_hits"] == 1
+
+
+def test_eviction_keeps_the_newest_entries(tmp_path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3", max_entries=32)
+    for i in range(100):
+        cache.put_many([f"k{i}"], [[float(i)]])
+
+    assert cache.stats()["entries"] <= 32
+    assert cache.get_many(["k99"]) == [[99.0]]
+    assert cache.get_many(["k0"]) == [None]
+
+
+def test_eviction_does_not_count_rows_on_every_write(tmp_path, monkeypatch):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite3", max_entries=32)
+    passes = []
+    evict = cache._evict
+    monkeypatch.setattr(cache, "_evict", lambda: passes.append(1) or evict())
+
+    for i in range(32):
+        cache.put_many([f"k{i}"], [[float(i)]])
+
+    assert len(passes) == 16
@@ -0,0 +1,217 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+from langchain_core.messages import HumanMessage
+from pydantic import Field
+
+from src.core.fake_providers import ScriptedChatModel
+from src.core.llm_router import GenerationRouter, ProviderUnavailableError
+from src.core.rate_limiter import RateLimitScheduler
+from src.schemas.chat_schemas import LLMModel, LLMProvider
+
+PRIMARY = "openai:gpt-4o"
+FALLBACK = "gemini:gemini-2.5-flash"
+MESSAGES = [HumanMessage(content="¿De qué trata el documento?")]
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("429 Too Many Requests")
+        self.response = SimpleNamespace(headers={"retry-after": str(retry_after)})
+
+
+class FlakyModel(ScriptedChatModel):
+    """Scripted model whose next calls raise ``errors`` or wait ``delays``."""
+
+    errors: List[Exception] = Field(default_factory=list)
+    delays: List[float] = Field(default_factory=list)
+    calls: int = 0
+
+    def _plan(self) -> float:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        if self.delays:
+            return self.delays.pop(0)
+        return super()._plan()
+
+
+def fake(name: str, first_token_ms: float = 10, **kwargs) -> FlakyModel:
+    return FlakyModel(
+        model_name=name,
+        first_token_ms=first_token_ms,
+        latency_sigma=0.0,
+        tokens_per_second=0,
+        answer_tokens=5,
+        **kwargs,
+    )
+
+
+def make_router(models, scheduler=None, **kwargs) -> GenerationRouter:
+    options = dict(
+        fallbacks={PRIMARY: FALLBACK},
+        hedge_min_delay=0.05,
+        hedge_max_delay=0.1,
+        window=50,
+        breaker_failures=2,
+        breaker_cooldown=0.2,
+    )
+    options.update(kwargs)
+    return GenerationRouter(
+        model_factory=lambda provider, model: models[f"{provider}:{model}"],
+        rate_limiter=scheduler or RateLimitScheduler({}),
+        **options,
+    )
+
+
+async def ask(router: GenerationRouter) -> str:
+    return await router.ainvoke(LLMProvider.OPENAI, LLMModel.GPT_4O, MESSAGES)
+
+
+async def ask_streaming(router: GenerationRouter) -> str:
+    stream = router.astream(LLMProvider.OPENAI, LLMModel.GPT_4O, MESSAGES)
+    return "".join([token async for token in stream])
+
+
+def answer_of(name: str) -> str:
+    return fake(name).invoke(MESSAGES).content
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_answers_alone():
+    models = {PRIMARY: fake(PRIMARY), FALLBACK: fake(FALLBACK)}
+    router = make_router(models)
+
+    assert await ask(router) == answer_of(PRIMARY)
+    assert models[FALLBACK].calls == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_fallback_wins():
+    models = {PRIMARY: fake(PRIMARY, first_token_ms=2_000), FALLBACK: fake(FALLBACK)}
+    router = make_router(models)
+
+    started = time.perf_counter()
+    assert await ask(router) == answer_of(FALLBACK)
+    # The primary was cancelled, not waited for
+    assert time.perf_counter() - started < 1
+    stats = router.stats()
+    assert stats["hedges"] == 1
+    assert stats["fallback_wins"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_is_hedged_on_the_first_token():
+    models = {PRIMARY: fake(PRIMARY, first_token_ms=2_000), FALLBACK: fake(FALLBACK)}
+    router = make_router(models)
+
+    assert await ask_streaming(router) == answer_of(FALLBACK)
+    assert router.stats()["hedges"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_primary_fails_over_at_once():
+    models = {
+        PRIMARY: fake(PRIMARY, errors=[RuntimeError("boom")]),
+        FALLBACK: fake(FALLBACK),
+    }
+    router = make_router(models, hedge_max_delay=5)
+
+    started = time.perf_counter()
+    assert await ask(router) == answer_of(FALLBACK)
+    assert time.perf_counter() - started < 1
+    assert router.stats()["failovers"] == 1
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_skips_the_primary_until_the_cooldown_ends():
+    models = {
+        PRIMARY: fake(PRIMARY, errors=[RuntimeError("boom")] * 2),
+        FALLBACK: fake(FALLBACK),
+    }
+    router = make_router(models)
+
+    for _ in range(3):
+        assert await ask(router) == answer_of(FALLBACK)
+    # Two failures opened the breaker, the third call never reached it
+    assert models[PRIMARY].calls == 2
+    assert router.stats()["breaker_skips"] == 1
+
+    await asyncio.sleep(0.2)
+    assert await ask(router) == answer_of(PRIMARY)
+    assert router.stats()["models"][f"{PRIMARY} (invoke)"]["breaker"] == "closed"
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_without_fallback_is_unavailable():
+    models = {PRIMARY: fake(PRIMARY, errors=[RuntimeError("boom")] * 2)}
+    router = make_router(models, fallbacks={})
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await ask(router)
+    with pytest.raises(ProviderUnavailableError):
+        await ask(router)
+
+
+@pytest.mark.asyncio
+async def test_cancelling_a_hedged_call_cancels_both_models():
+    models = {
+        PRIMARY: fake(PRIMARY, first_token_ms=2_000),
+        FALLBACK: fake(FALLBACK, first_token_ms=2_000),
+    }
+    router = make_router(models)
+
+    call = asyncio.create_task(ask(router))
+    await asyncio.sleep(0.2)
+    assert models[FALLBACK].calls == 1
+    call.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+    assert asyncio.all_tasks() == {asyncio.current_task()}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_half_open_trial_lets_the_next_call_try_again():
+    models = {
+        PRIMARY: fake(PRIMARY, errors=[RuntimeError("boom")] * 2, delays=[2.0]),
+        FALLBACK: fake(FALLBACK),
+    }
+    router = make_router(models, fallbacks={})
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await ask(router)
+    await asyncio.sleep(0.2)
+
+    # The trial call is abandoned before the model answers
+    trial = asyncio.create_task(ask(router))
+    await asyncio.sleep(0.05)
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+
+    assert await ask(router) == answer_of(PRIMARY)
+    assert models[PRIMARY].calls == 4
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_call_queues_without_tripping_the_breaker():
+    models = {PRIMARY: fake(PRIMARY, errors=[RateLimited(0.2)] * 2)}
+    scheduler = RateLimitScheduler({"openai": (6_000, 0)})
+    router = make_router(models, scheduler, fallbacks={}, breaker_failures=1)
+
+    started = time.perf_counter()
+    answer = await ask(router)
+
+    assert answer == fake(PRIMARY).invoke(MESSAGES).content
+    # Both retries waited out the provider's Retry-After
+    assert time.perf_counter() - started >= 0.3
+    assert models[PRIMARY].calls == 3
+    stats = router.stats()
+    assert stats["rate_limited"] == 2
+    assert stats["models"][f"{PRIMARY} (invoke)"]["breaker"] == "closed"
@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.schemas.chat_schemas import LLMModel, Role
+from src.services.memory_service import MemoryService
+from src.utils.token_utils import get_token_counter
+
+MODEL = LLMModel.GPT_4O_MINI
+
+
+def make_service(tail_tokens: int = 100, tail_max_messages: int = 20) -> MemoryService:
+    return MemoryService(
+        llm_registry=None,
+        summary_model="openai:gpt-4o-mini",
+        tail_tokens=tail_tokens,
+        tail_max_messages=tail_max_messages,
+        summary_max_tokens=50,
+    )
+
+
+def message(role: Role, content: str) -> SimpleNamespace:
+    return SimpleNamespace(role=role, content=content)
+
+
+def test_build_tail_keeps_the_newest_messages_that_fit():
+    counter = get_token_counter(MODEL.value)
+    turns = [
+        message(Role.USER, "first question " * 10),
+        message(Role.ASSISTANT, "first answer"),
+        message(Role.USER, "second question"),
+    ]
+    budget = counter.count("first answer") + counter.count("second question")
+
+    tail = make_service(tail_tokens=budget).build_tail(turns, MODEL)
+
+    assert tail == [
+        AIMessage(content="first answer"),
+        HumanMessage(content="second question"),
+    ]
+
+
+def test_build_tail_truncates_a_single_oversized_message():
+    counter = get_token_counter(MODEL.value)
+    answer = "word " * 200
+
+    [tail] = make_service(tail_tokens=5).build_tail(
+        [message(Role.ASSISTANT, answer)], MODEL
+    )
+
+    assert tail.content == counter.truncate(answer, 5)
+
+
+def test_fold_count_waits_while_the_tail_fits():
+    service = make_service(tail_tokens=100, tail_max_messages=20)
+
+    assert service.fold_count([]) == 0
+    assert service.fold_count([5] * 20) == 0
+
+
+def test_fold_count_folds_when_over_the_token_budget():
+    service = make_service(tail_tokens=100, tail_max_messages=20)
+
+    # Keeps the newest messages up to half the budget
+    assert service.fold_count([40, 40, 20, 20]) == 2
+    # The newest message stays even when it alone fills the budget
+    assert service.fold_count([10, 120]) == 1
+
+
+def test_fold_count_folds_when_over_the_message_cap():
+    service = make_service(tail_tokens=1_000, tail_max_messages=20)
+
+    # 25 short turns fit the tokens but load_history would drop 5 of them
+    assert service.fold_count([5] * 25) == 15
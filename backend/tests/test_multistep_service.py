@@ -0,0 +1,109 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.documents import Document as Chunk
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.services.memory_service import ConversationHistory
+from src.services.multistep_service import MultiStepRetriever
+
+QUESTION = "¿Cómo evolucionaron las ventas y los costes durante el último año?"
+
+
+class StubVectorization:
+    """First pass finds ``first``, every sub-query finds ``sub``."""
+
+    def __init__(self, delay: float = 0.02) -> None:
+        self.delay = delay
+
+    async def aembed_query(self, text):
+        await asyncio.sleep(self.delay)
+        return [1.0, 0.0]
+
+    async def aembed_queries(self, texts):
+        return [[0.0, 1.0] for _ in texts]
+
+    async def asearch_by_vector_with_relevance(self, vector, document, k):
+        name = "first" if vector == [1.0, 0.0] else "sub"
+        return [(Chunk(id=name, page_content=name), 0.5)]
+
+
+class StubPlanner:
+    def __init__(self, answer: str, delay: float) -> None:
+        self.answer = answer
+        self.delay = delay
+        self.prompts = []
+
+    def get(self, provider, model, temperature):
+        return self
+
+    async def ainvoke(self, messages):
+        self.prompts.append(messages[-1].content)
+        await asyncio.sleep(self.delay)
+        return AIMessage(content=self.answer)
+
+
+def make_retriever(planner: StubPlanner, **kwargs) -> MultiStepRetriever:
+    options = dict(
+        planner_model="openai:gpt-4o-mini",
+        plan_min_words=3,
+        max_sub_queries=3,
+        sub_query_k=5,
+        refine_max_steps=0,
+        refine_skip_score=0.8,
+        plan_wait_factor=1.0,
+        plan_min_wait_ms=50,
+    )
+    options.update(kwargs)
+    return MultiStepRetriever(StubVectorization(), planner, **options)
+
+
+DOCUMENT = SimpleNamespace(id=1)
+
+
+@pytest.mark.asyncio
+async def test_plan_in_time_adds_sub_query_hits():
+    retriever = make_retriever(StubPlanner("ventas 2023\ncostes 2023", delay=0.01))
+
+    result = await retriever.retrieve(QUESTION, DOCUMENT)
+
+    assert result.sub_queries == ["ventas 2023", "costes 2023"]
+    assert {chunk.id for chunk, _ in result.scored_docs} == {"first", "sub"}
+    assert not result.plan_timed_out
+
+
+@pytest.mark.asyncio
+async def test_slow_plan_does_not_hold_up_the_first_pass():
+    retriever = make_retriever(StubPlanner("ventas 2023", delay=2.0))
+
+    started = time.perf_counter()
+    result = await retriever.retrieve(QUESTION, DOCUMENT)
+
+    assert time.perf_counter() - started < 0.5
+    assert result.plan_timed_out
+    assert result.sub_queries == []
+    assert [chunk.id for chunk, _ in result.scored_docs] == ["first"]
+
+
+@pytest.mark.asyncio
+async def test_planner_sees_the_summary_and_previous_turn():
+    planner = StubPlanner("NINGUNA", delay=0)
+    history = ConversationHistory(
+        summary="El usuario analiza el informe anual de 2023.",
+        messages=[
+            HumanMessage(content="¿Qué dice sobre las ventas?"),
+            AIMessage(content="Subieron un 20%."),
+        ],
+    )
+
+    await make_retriever(planner).retrieve(
+        "¿Y cómo quedaron los costes en ese mismo periodo?", DOCUMENT, history=history
+    )
+
+    [prompt] = planner.prompts
+    assert "informe anual de 2023" in prompt
+    assert "¿Qué dice sobre las ventas?" in prompt
+    assert "Subieron un 20%" not in prompt
+    assert prompt.endswith("¿Y cómo quedaron los costes en ese mismo periodo?")
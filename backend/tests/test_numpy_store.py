@@ -0,0 +1,17 @@
+import numpy as np
+
+from src.core.fake_providers import HashingEmbeddings
+from src.core.numpy_store import NumpyVectorStore
+
+
+def test_search_leaves_the_query_vector_untouched(tmp_path):
+    embeddings = HashingEmbeddings(size=64)
+    store = NumpyVectorStore(embeddings, tmp_path)
+    store.add_texts(["uno dos tres"], metadatas=[{"content_hash": "h", "chunk_idx": 0}])
+    query = np.array(embeddings.embed("uno dos"), dtype=np.float32) * 3
+    before = query.copy()
+
+    [(chunk, _)] = store.similarity_search_by_vector_with_score(query, k=1)
+
+    assert chunk.page_content == "uno dos tres"
+    np.testing.assert_array_equal(query, before)
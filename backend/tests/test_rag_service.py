@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.documents import Document as Chunk
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.core.answer_cache import AnswerCache
+from src.schemas.chat_schemas import LLMModel, LLMProvider
+from src.services.memory_service import ConversationHistory
+from src.services.multistep_service import RetrievalResult
+from src.services.rag_service import RagService
+
+DOCUMENT = SimpleNamespace(id=1, filename="informe.pdf")
+
+
+class StubRetriever:
+    """Always retrieves the same chunk for the same question vector."""
+
+    async def retrieve(self, question, document, k=10, is_answered=None, history=None):
+        vector = [1.0, 0.0, 0.0]
+        chunk = Chunk(
+            id="doc_h_chunk_0",
+            page_content="Las ventas subieron un 20%.",
+            metadata={"content_hash": "h", "chunk_idx": 0},
+        )
+        scored_docs = [(chunk, 0.9)]
+        result = RetrievalResult(vector, scored_docs)
+        result.stopped = bool(is_answered and is_answered(vector, scored_docs))
+        return result
+
+
+class CountingRouter:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def ainvoke(self, provider, model, messages):
+        self.calls += 1
+        return f"respuesta {self.calls}"
+
+
+def make_service():
+    router = CountingRouter()
+    service = RagService(
+        vectorization_service=None,
+        generation_router=router,
+        retriever=StubRetriever(),
+        answer_cache=AnswerCache(max_entries=10, ttl_seconds=60, threshold=0.95),
+    )
+    return service, router
+
+
+async def ask(service: RagService, question: str, history: ConversationHistory):
+    return await service.rag_query(
+        question, history, DOCUMENT, LLMProvider.OPENAI, LLMModel.GPT_4O_MINI
+    )
+
+
+@pytest.mark.asyncio
+async def test_same_question_without_history_is_served_from_cache():
+    service, router = make_service()
+
+    assert await ask(service, "¿Y el segundo?", ConversationHistory()) == "respuesta 1"
+    assert await ask(service, "¿Y el segundo?", ConversationHistory()) == "respuesta 1"
+    assert router.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_different_histories_do_not_share_an_answer():
+    service, router = make_service()
+    about_sales = ConversationHistory(
+        messages=[HumanMessage(content="¿Cómo fueron las ventas?")]
+    )
+    about_costs = ConversationHistory(
+        summary="El usuario pregunta por los costes.",
+        messages=[HumanMessage(content="¿Y los costes?")],
+    )
+
+    assert await ask(service, "¿Y el segundo?", about_sales) == "respuesta 1"
+    assert await ask(service, "¿Y el segundo?", about_costs) == "respuesta 2"
+    assert router.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_asking_again_in_the_same_conversation_generates_again():
+    service, router = make_service()
+    history = ConversationHistory()
+
+    first = await ask(service, "Dime más", history)
+    history.messages += [HumanMessage(content="Dime más"), AIMessage(content=first)]
+
+    assert await ask(service, "Dime más", history) == "respuesta 2"
@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+import pytest
+
+from src.core.rate_limiter import RateLimitScheduler
+
+
+@pytest.mark.asyncio
+async def test_waiters_queue_until_the_bucket_refills():
+    scheduler = RateLimitScheduler({"openai": (600, 0)})
+    started = time.monotonic()
+    await asyncio.gather(*[scheduler.aacquire("openai", 1) for _ in range(601)])
+    # The 601st request waits for 1/10 s of refill
+    assert time.monotonic() - started >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_unlimited_provider_never_waits():
+    scheduler = RateLimitScheduler({"openai": (0, 0)})
+    await asyncio.wait_for(scheduler.aacquire("openai", 10**9), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_back_a_grant_it_never_used():
+    scheduler = RateLimitScheduler({"openai": (1, 0)})
+    await scheduler.aacquire("openai", 1)
+    waiter = asyncio.create_task(scheduler.aacquire("openai", 1))
+    await asyncio.sleep(0.01)
+
+    # Grant it the way the dispatcher thread would, then cancel before the
+    # grant reaches the waiting task
+    limiter = scheduler._limiters["openai"]
+    with scheduler._cond:
+        bucket, _ = limiter.buckets[0]
+        bucket.level = bucket.capacity
+        limiter.dispatch(time.monotonic())
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert scheduler.stats()["openai"]["requests_available"] == 1
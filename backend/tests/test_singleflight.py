@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from src.core.singleflight import SingleFlight
+
+
+def producer(parts: int, delay: float = 0.01):
+    async def produce():
+        for i in range(parts):
+            await asyncio.sleep(delay)
+            yield f"p{i} "
+
+    return produce
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_producer():
+    flight = SingleFlight()
+    results = await asyncio.gather(*[flight.do("k", producer(5)) for _ in range(3)])
+    assert results == ["p0 p1 p2 p3 p4 "] * 3
+    assert flight.stats()["started"] == 1
+    assert flight.stats()["joined"] == 2
+
+
+@pytest.mark.asyncio
+async def test_producer_error_reaches_every_caller():
+    async def produce():
+        yield "p0 "
+        raise RuntimeError("boom")
+
+    flight = SingleFlight()
+    results = await asyncio.gather(
+        flight.do("k", produce), flight.do("k", produce), return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_caller_after_abandoned_flight_gets_full_answer():
+    flight = SingleFlight()
+    stream = flight.stream("k", producer(5))
+    parts = []
+    async for part in stream:
+        parts.append(part)
+        if len(parts) == 3:
+            break
+    await stream.aclose()
+
+    # Joins before the cancelled producer task has had a chance to run
+    assert await flight.do("k", producer(5)) == "p0 p1 p2 p3 p4 "
+    assert flight.stats()["started"] == 2
+    assert flight.stats()["in_flight"] == 0